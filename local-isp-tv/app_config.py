@@ -0,0 +1,96 @@
+"""App settings shared by the GUI and the headless runner
+
+Kept free of heavy imports so the app can read its settings before the
+scraping stack is loaded.
+"""
+import json
+
+
+class Config:
+    """Configuration manager"""
+    def __init__(self):
+        self.token = ""
+        self.repo = ""
+        self.path = "channels.m3u"
+        self.branch = "main"
+        self.interval = 2.0
+        self.workers = 15
+        self.timeout = 15
+        self.retries = 2
+        self.run_budget = 10.0
+        self.cache_ttl = 6.0
+        self.engine = "threads"
+        self.async_concurrency = 100
+        self.parser = "auto"
+        self.stream_resolve = False
+        self.stream_max_kb = 256
+        self.adaptive = False
+        self.hedge = False
+        self.probe_streams = False
+        self.publish_backend = "contents"
+        self.write_categories = False
+        self.write_json = False
+        self.write_gzip = False
+        self.mirror_logos = False
+        self.logo_size = 0
+        self.logo_base_url = ""
+        self.lan_server = False
+        self.lan_port = 8090
+        self.providers = []
+        self.paused = False
+
+
+config = Config()
+
+
+# Stored setting key -> Config attribute; the app's JsonStore and the
+# headless runner read config.json through this table
+SETTINGS = {
+    'github_token': 'token',
+    'github_repo': 'repo',
+    'github_path': 'path',
+    'github_branch': 'branch',
+    'interval': 'interval',
+    'workers': 'workers',
+    'timeout': 'timeout',
+    'retries': 'retries',
+    'run_budget': 'run_budget',
+    'cache_ttl': 'cache_ttl',
+    'engine': 'engine',
+    'async_concurrency': 'async_concurrency',
+    'parser': 'parser',
+    'stream_resolve': 'stream_resolve',
+    'stream_max_kb': 'stream_max_kb',
+    'adaptive': 'adaptive',
+    'hedge_requests': 'hedge',
+    'probe_streams': 'probe_streams',
+    'publish_backend': 'publish_backend',
+    'write_categories': 'write_categories',
+    'write_json': 'write_json',
+    'write_gzip': 'write_gzip',
+    'mirror_logos': 'mirror_logos',
+    'logo_size': 'logo_size',
+    'logo_base_url': 'logo_base_url',
+    'lan_server': 'lan_server',
+    'lan_port': 'lan_port',
+    'providers': 'providers',
+    'paused': 'paused'
+}
+
+
+def apply_settings(stored):
+    """Set config from {setting key: value}; missing keys get their defaults"""
+    defaults = Config()
+    for key, attr in SETTINGS.items():
+        setattr(config, attr, stored.get(key, getattr(defaults, attr)))
+
+
+def read_settings(path):
+    """Stored settings from a JsonStore file ({key: {"value": ...}})"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {key: entry["value"] for key, entry in data.items()
+            if isinstance(entry, dict) and "value" in entry}
@@ -0,0 +1,342 @@
+"""asyncio resolver engine
+
+Resolves every channel on a single event loop with bounded concurrency.
+It uses a minimal HTTP/1.1 client built on asyncio streams so it needs no
+extra dependency on Android; connections are kept alive and reused.
+Response bodies are capped at max_body bytes, both as received and after
+decompression; a larger response fails the request instead of being read
+into memory. In streaming mode (config.stream_resolve) player pages are
+instead read up to config.stream_max_kb and matched on what was read, as
+the thread engine does.
+"""
+import asyncio
+import ssl
+import time
+import zlib
+from contextlib import nullcontext
+from urllib.parse import urljoin, urlsplit
+
+from concurrency import AsyncAdaptiveLimiter
+from metrics import error_kind
+from resilience import Cancelled
+from stream_matcher import CHUNK_SIZE, find_stream_url_prefix
+
+MAX_REDIRECTS = 5
+# Larger responses fail; far above any player page
+MAX_BODY_BYTES = 8 * 1024 * 1024
+READ_CHUNK = 64 * 1024
+
+
+class AsyncHttpError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def is_overload_error(exc):
+    """Timeouts, dropped connections and HTTP 429/5xx"""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True
+    status = getattr(exc, "status", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+class AsyncResponse:
+    def __init__(self, status, url, headers, body, wire_size=0, truncated=False):
+        self.status = status
+        self.url = url
+        self.headers = headers
+        self.body = body
+        # Reading stopped at the client's max_body
+        self.truncated = truncated
+        # Body bytes as received, before decompression
+        self.wire_size = wire_size
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+class AsyncHttpClient:
+    """Keep-alive HTTP/1.1 GET client on top of asyncio streams
+
+    A body over max_body bytes raises ValueError, or with truncate=True is
+    cut at max_body and the response marked truncated.
+    """
+    def __init__(self, max_body=MAX_BODY_BYTES, truncate=False):
+        self.max_body = max_body
+        self.truncate = truncate
+        self.idle = {}
+        self.ssl_context = None
+        self.connections_opened = 0
+        self.requests = 0
+
+    async def get(self, url, headers=None, timeout=15):
+        """GET a URL, following redirects, within an overall timeout"""
+        return await asyncio.wait_for(self._get(url, headers or {}), timeout)
+
+    async def _get(self, url, headers):
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._request(url, headers)
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return response
+        raise AsyncHttpError(f"Too many redirects: {url}")
+
+    async def _request(self, url, headers):
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        port = parts.port or (443 if secure else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        lines = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}",
+                 "Accept-Encoding: gzip, deflate", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        # A pooled connection may have been closed by the server; retry once fresh
+        reused = bool(self.idle.get(key))
+        try:
+            return await self._exchange(key, secure, payload, url, reuse=True)
+        except (ConnectionError, asyncio.IncompleteReadError, AsyncHttpError):
+            if not reused:
+                raise
+        return await self._exchange(key, secure, payload, url, reuse=False)
+
+    async def _exchange(self, key, secure, payload, url, reuse):
+        reader, writer = await self._connect(key, secure, reuse)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            status, headers, body, wire_size, keep_alive, truncated = await self._read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        self.requests += 1
+        if keep_alive:
+            self.idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+        return AsyncResponse(status, url, headers, body, wire_size, truncated)
+
+    async def _connect(self, key, secure, reuse):
+        pool = self.idle.get(key)
+        while reuse and pool:
+            reader, writer = pool.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        if secure and self.ssl_context is None:
+            self.ssl_context = ssl.create_default_context()
+        self.connections_opened += 1
+        return await asyncio.open_connection(
+            key[1], key[2], ssl=self.ssl_context if secure else None
+        )
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise AsyncHttpError("Connection closed before response")
+        try:
+            version, status = status_line.split(None, 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise AsyncHttpError(f"Bad status line: {status_line[:60]!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        chunks, received, truncated = [], 0, False
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                take = self._allowed(received, size)
+                chunks.append(await reader.readexactly(take))
+                received += take
+                if take < size:
+                    truncated = True
+                    break
+                await reader.readline()
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            take = self._allowed(0, length)
+            body = await reader.readexactly(take)
+            truncated = take < length
+        elif status in (204, 304) or 100 <= status < 200:
+            body = b""
+        else:
+            # No length: the body ends when the server closes the connection
+            while True:
+                chunk = await reader.read(READ_CHUNK)
+                if not chunk:
+                    break
+                take = self._allowed(received, len(chunk))
+                chunks.append(chunk[:take])
+                received += take
+                if take < len(chunk):
+                    truncated = True
+                    break
+            body = b"".join(chunks)
+            keep_alive = False
+        if truncated:
+            # The rest of the body is still on the wire
+            keep_alive = False
+
+        wire_size = len(body)
+        encoding = headers.get("content-encoding", "").lower()
+        if encoding == "gzip":
+            body, cut = self._decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            try:
+                body, cut = self._decompress(body, zlib.MAX_WBITS)
+            except zlib.error:
+                body, cut = self._decompress(body, -zlib.MAX_WBITS)
+        else:
+            cut = False
+        return status, headers, body, wire_size, keep_alive, truncated or cut
+
+    def _allowed(self, received, size):
+        """How many bytes of the next size-byte piece fit under max_body"""
+        if received + size <= self.max_body:
+            return size
+        if not self.truncate:
+            raise ValueError(f"response larger than {self.max_body // 1024} KB")
+        return self.max_body - received
+
+    def _decompress(self, body, wbits):
+        """(inflated body, whether it was cut at max_body)"""
+        body = zlib.decompressobj(wbits).decompress(body, self.max_body + 1)
+        take = self._allowed(0, len(body))
+        return body[:take], take < len(body)
+
+    def close(self):
+        for pool in self.idle.values():
+            for _, writer in pool:
+                writer.close()
+        self.idle.clear()
+
+
+async def resolve_one(client, stream_id, player_url, headers, match, timeout, controller=None, metrics=None,
+                      guard=None, hedger=None):
+    """Async counterpart of resolve_stream_url()"""
+    url = player_url(stream_id)
+
+    async def attempt(attempt_timeout):
+        start = time.monotonic()
+        try:
+            response = await client.get(url, headers=headers, timeout=attempt_timeout)
+            if response.status >= 400:
+                raise AsyncHttpError(f"HTTP {response.status} for {url}", response.status)
+        except Exception as e:
+            if controller and is_overload_error(e):
+                controller.on_overload()
+            raise
+        if controller:
+            controller.on_success(time.monotonic() - start)
+        if metrics:
+            metrics.request("resolve", time.monotonic() - start, received=response.wire_size)
+        return response
+
+    async def hedged(attempt_timeout):
+        if hedger:
+            return await hedger.acall(lambda: attempt(attempt_timeout))
+        return await attempt(attempt_timeout)
+
+    try:
+        if guard:
+            response = await guard.acall(url, hedged, is_overload_error, timeout)
+        else:
+            response = await hedged(timeout)
+        if response.truncated:
+            # Streaming mode ran into stream_max_kb; a URL cut at the end is not used
+            stream_url = find_stream_url_prefix(response.text, response.url)
+        else:
+            stream_url = match(response.text, response.url)
+        if metrics and not stream_url:
+            metrics.error("resolve", "no_stream")
+        return stream_url
+    except Cancelled:
+        raise
+    except Exception as e:
+        if metrics:
+            metrics.error("resolve", error_kind(e))
+        print(f"Error resolving stream {stream_id}: {e!r}")
+        return None
+
+
+async def _resolve_all(channels, on_result, player_url, headers, match, concurrency, timeout, controller, metrics,
+                       guard, hedger, stream_max_bytes):
+    if stream_max_bytes:
+        # Like the thread engine's streaming mode, which reads one chunk past the cap
+        client = AsyncHttpClient(stream_max_bytes + CHUNK_SIZE, truncate=True)
+    else:
+        client = AsyncHttpClient()
+    queue = iter(channels)
+    limiter = AsyncAdaptiveLimiter(controller) if controller else nullcontext()
+
+    async def worker():
+        # Workers pull from a shared iterator so only `concurrency` tasks exist;
+        # with a controller, only its current limit of them are in flight
+        for channel in queue:
+            if guard and guard.stopped():
+                # Out of time or cancelled: the rest get no result
+                return
+            async with limiter:
+                start = time.monotonic()
+                stream_url = await resolve_one(client, channel["id"], player_url, headers, match, timeout, controller,
+                                               metrics, guard, hedger)
+            on_result(channel, stream_url, time.monotonic() - start)
+
+    # Cancelling the run cancels this task, and with it every request in flight
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    unregister = guard.cancel.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel)) if guard else None
+    try:
+        workers = [worker() for _ in range(max(1, min(concurrency, len(channels))))]
+        await asyncio.gather(*workers)
+    finally:
+        if unregister:
+            unregister()
+        client.close()
+        print(f"Async HTTP: {client.requests} requests over {client.connections_opened} connections")
+
+
+def resolve_all(channels, on_result, player_url, headers, match, concurrency=100, timeout=15, controller=None,
+                metrics=None, guard=None, hedger=None, stream_max_bytes=None):
+    """Resolve channels on a private event loop in the calling thread
+
+    player_url(stream_id) gives a channel's player page and match(html, url)
+    finds the stream in it. on_result(channel, stream_url, seconds) is called
+    once per channel, with None for channels that could not be resolved. An optional AIMDController
+    adapts the number of in-flight requests, up to `concurrency`; an optional
+    RunMetrics records each request, an optional resilience.Guard adds
+    retries, circuit breaking and the run deadline, and an optional
+    hedging.Hedger races a backup request against slow ones. Channels not
+    started when the guard stops get no result; cancelling its token aborts
+    the requests in flight and returns early. With stream_max_bytes only
+    that much of each player page is read and matched; without it, pages
+    larger than MAX_BODY_BYTES count as failed.
+    """
+    try:
+        asyncio.run(_resolve_all(channels, on_result, player_url, headers, match, concurrency, timeout,
+                                 controller, metrics, guard, hedger, stream_max_bytes))
+    except (asyncio.CancelledError, Cancelled):
+        if not (guard and guard.cancel.cancelled()):
+            raise
+        print("Async resolve cancelled")
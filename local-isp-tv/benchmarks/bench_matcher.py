@@ -0,0 +1,85 @@
+"""Micro-benchmark: single-pass StreamMatcher vs. the per-pattern re.search loop
+
+Usage: python benchmarks/bench_matcher.py [iterations]
+
+Runs both matchers over the sample player pages in benchmarks/player_pages,
+checks that they return the same URL for every page and prints the time per
+page for each approach. Exits with 1 on a mismatch, or when the matcher is
+much slower than the legacy loop on a page (see SLOW_FACTOR).
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from stream_matcher import find_stream_url
+
+PAGES_DIR = Path(__file__).resolve().parent / "player_pages"
+PAGE_URL = "http://redforce.live/player.php?stream=1"
+# A page counts as a regression when the matcher takes more than
+# SLOW_FACTOR times the legacy time and over SLOW_MARGIN_US more
+SLOW_FACTOR = 2
+SLOW_MARGIN_US = 1000
+
+LEGACY_PATTERNS = [
+    r'<iframe[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']',
+    r'<source[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']',
+    r'file:\s*["\']([^"\']*\.m3u8[^"\']*)["\']',
+    r'source:\s*["\']([^"\']*\.m3u8[^"\']*)["\']',
+    r'(https?://[^\s\'"<>]*\.m3u8[^\s\'"<>]*)'
+]
+
+
+def legacy_find(text, page_url):
+    """The matching loop resolve_stream_url() used before StreamMatcher"""
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return urljoin(page_url, match.group(1).strip())
+    if ".m3u8" in page_url:
+        return page_url
+    return None
+
+
+def bench(func, text, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(text, PAGE_URL)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pages = sorted(PAGES_DIR.glob("*.html"))
+    if not pages:
+        print(f"No sample pages in {PAGES_DIR}")
+        return 1
+
+    mismatches = slow = 0
+    total_legacy = total_matcher = 0.0
+    print(f"{'page':<26}{'legacy us':>12}{'matcher us':>12}{'speedup':>10}")
+    for path in pages:
+        text = path.read_text(encoding="utf-8")
+        expected = legacy_find(text, PAGE_URL)
+        got = find_stream_url(text, PAGE_URL)
+        if expected != got:
+            mismatches += 1
+            print(f"MISMATCH {path.name}: legacy={expected!r} matcher={got!r}")
+
+        legacy_us = bench(legacy_find, text, iterations)
+        matcher_us = bench(find_stream_url, text, iterations)
+        total_legacy += legacy_us
+        total_matcher += matcher_us
+        print(f"{path.name:<26}{legacy_us:>12.1f}{matcher_us:>12.1f}{legacy_us / matcher_us:>9.2f}x")
+        if matcher_us > legacy_us * SLOW_FACTOR and matcher_us - legacy_us > SLOW_MARGIN_US:
+            slow += 1
+            print(f"SLOW {path.name}: matcher {matcher_us / legacy_us:.1f}x the legacy time")
+
+    print(f"{'total':<26}{total_legacy:>12.1f}{total_matcher:>12.1f}{total_legacy / total_matcher:>9.2f}x")
+    return 1 if mismatches or slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Peak memory of a full scrape at growing channel counts
+
+Usage:
+    python benchmarks/bench_memory.py [--channels 1000,5000,20000]
+        [--engines threads,asyncio] [--workers 15] [--page-kb 20]
+        [--latency 0.005] [--save results.json] [--baseline old.json]
+
+Starts tools/fake_redforce.py, then runs scraper.scrape_channels() once
+per engine and channel count, each in a fresh interpreter with an empty
+cache directory. Reports the RSS after the pipeline is imported, the peak
+RSS of the run and the difference, which is what the channel list, the
+futures and the response bodies cost. It also reports the Python heap
+(tracemalloc) held by the parsed channel list alone. Peak RSS includes the
+interpreter and libraries; compare rows against a --baseline from the
+same machine.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench_scrape import APP_DIR, int_list, start_server
+
+
+def rss_mb():
+    """Current and peak RSS in MB, from /proc where available"""
+    try:
+        status = Path("/proc/self/status").read_text()
+        fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        return peak, peak
+
+
+def child(params):
+    """Run one scrape in this process and print its memory figures as JSON"""
+    sys.path.insert(0, str(APP_DIR))
+    import urllib.request
+
+    import channel_parser
+    import scraper
+    from app_config import config
+    from metrics import start_run
+
+    config.workers = params["workers"]
+    config.async_concurrency = params["workers"]
+    config.engine = params["engine"]
+    base_url = f"{params['url']}{params['channels']}/"
+    scraper.BASE_URL = base_url
+    scraper.HEADERS["Referer"] = base_url
+    scraper.M3U_FILE = Path("channels.m3u")
+
+    base, _ = rss_mb()
+    run = start_run()
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        total, resolved = scraper.scrape_channels()
+        elapsed = time.perf_counter() - start
+    _, peak = rss_mb()
+
+    # Heap held by the parsed channel records alone; parse once first so
+    # the parser's own imports and caches are not counted
+    with urllib.request.urlopen(base_url, timeout=30) as response:
+        html = response.read().decode("utf-8")
+    channel_parser.parse_channels(html, base_url, config.parser)
+    tracemalloc.start()
+    records = channel_parser.parse_channels(html, base_url, config.parser)
+    records_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    del records
+    print(json.dumps({
+        "channels": total,
+        "resolved": resolved,
+        "seconds": round(elapsed, 2),
+        "base_rss_mb": round(base, 1),
+        "peak_rss_mb": round(peak, 1),
+        "run_mb": round(peak - base, 1),
+        "records_kb": round(records_kb),
+        "requests": run.stats("resolve").report()["count"]
+    }))
+
+
+def run_case(url, args, engine, channels):
+    params = {"url": url, "engine": engine, "workers": args.workers, "channels": channels}
+    command = [sys.executable, str(Path(__file__).resolve()), "--child", json.dumps(params)]
+    with tempfile.TemporaryDirectory() as work:
+        output = subprocess.run(command, cwd=work, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"{engine}/{channels} failed:\n{output.stderr[-2000:]}")
+    row = {"engine": engine, "workers": args.workers}
+    row.update(json.loads(output.stdout.strip().splitlines()[-1]))
+    return row
+
+
+def print_rows(rows, baseline):
+    header = (f"{'engine':<8}{'channels':>9}{'resolved':>9}{'secs':>8}{'base MB':>9}{'peak MB':>9}"
+              f"{'run MB':>8}{'records KB':>11}")
+    if baseline:
+        header += f"{'Δ run MB':>10}{'Δ records':>11}"
+    print(header)
+    before = {(row["engine"], row["channels"]): row for row in baseline}
+    for row in rows:
+        line = (f"{row['engine']:<8}{row['channels']:>9}{row['resolved']:>9}{row['seconds']:>8.2f}"
+                f"{row['base_rss_mb']:>9.1f}{row['peak_rss_mb']:>9.1f}{row['run_mb']:>8.1f}{row['records_kb']:>11}")
+        old = before.get((row["engine"], row["channels"]))
+        if old:
+            line += f"{row['run_mb'] - old['run_mb']:>+10.1f}"
+            line += f"{row['records_kb'] / old['records_kb'] - 1:>+11.0%}" if old["records_kb"] else f"{'':>11}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int_list, default=[1000, 5000, 20000])
+    parser.add_argument("--engines", default="threads,asyncio")
+    parser.add_argument("--workers", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--page-kb", type=float, default=20)
+    parser.add_argument("--save", help="write the result rows to this JSON file")
+    parser.add_argument("--baseline", help="compare against rows saved with --save")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(json.loads(args.child))
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())["rows"] if args.baseline else []
+    server_args = argparse.Namespace(latency=args.latency, jitter=0.0, error_rate=0.0, page_kb=args.page_kb,
+                                     tail_rate=0.0, tail_latency=1.0, slow_share=0.0)
+    server, url = start_server(server_args)
+    rows = []
+    try:
+        for engine in args.engines.split(","):
+            for channels in args.channels:
+                rows.append(run_case(url, args, engine, channels))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.workers} workers, latency {args.latency}s, {args.page_kb:g} KB pages, {os.cpu_count()} CPUs")
+    print_rows(rows, baseline)
+    if args.save:
+        settings = {k: getattr(args, k) for k in ("workers", "latency", "page_kb")}
+        Path(args.save).write_text(json.dumps({"settings": settings, "rows": rows}, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
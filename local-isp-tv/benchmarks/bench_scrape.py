@@ -0,0 +1,203 @@
+"""End-to-end scrape benchmark against a simulated redforce.live
+
+Usage:
+    python benchmarks/bench_scrape.py [--channels 100,1000] [--workers 5,15,30]
+        [--engines threads,asyncio] [--latency 0.05] [--jitter 0.02]
+        [--error-rate 0.01] [--page-kb 20] [--tail-rate 0.02] [--slow-share 0.05]
+        [--tail-latency 1.0] [--hedge off,on] [--warm] [--save results.json]
+        [--baseline old.json]
+
+Starts tools/fake_redforce.py in its own process, then runs
+scraper.scrape_channels() once per engine/worker/channel combination, each
+in a fresh interpreter with an empty cache directory. Reports player pages
+per second, p50/p95/p99 player request latency and p99 time per channel
+(retries and hedges included, from the scraper's own metrics),
+peak RSS and the bytes the server sent. --hedge compares runs with and
+without hedged requests; --warm runs each case twice in the same cache
+directory (stream cache off) and measures the second run, which starts
+from the per-stream latency history. --save writes the rows as JSON;
+--baseline prints the change in throughput and p95 against a saved run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+SERVER = APP_DIR / "tools" / "fake_redforce.py"
+
+
+def child(params):
+    """Run one scrape in this process and print its measurements as JSON"""
+    import resource
+
+    sys.path.insert(0, str(APP_DIR))
+    import scraper
+    from app_config import config
+    from metrics import percentile, start_run
+
+    config.workers = params["workers"]
+    config.async_concurrency = params["workers"]
+    config.engine = params["engine"]
+    config.timeout = params["timeout"]
+    config.hedge = params["hedge"] == "on"
+    if params["warm"]:
+        # Resolve everything again so the latency history decides the order
+        config.cache_ttl = 0
+    base_url = f"{params['url']}{params['channels']}/"
+    scraper.BASE_URL = base_url
+    scraper.HEADERS["Referer"] = base_url
+    scraper.M3U_FILE = Path("channels.m3u")
+
+    run = start_run()
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        total, resolved = scraper.scrape_channels()
+        elapsed = time.perf_counter() - start
+
+    resolve = run.stats("resolve")
+    latencies = sorted(resolve.latencies)
+    per_channel = sorted(run.stats("channel").latencies)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({
+        "channels": total,
+        "resolved": resolved,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "channel_p99_ms": round(percentile(per_channel, 99) * 1000, 1) if per_channel else None,
+        "peak_rss_mb": round(peak_mb, 1),
+        "resolve_errors": sum(resolve.errors.values()),
+        "hedges": run.counts.get("hedges", 0)
+    }))
+
+
+def server_stats(url, reset=False):
+    with urllib.request.urlopen(f"{url}_stats{'?reset=1' if reset else ''}", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def start_server(args):
+    command = [
+        sys.executable, str(SERVER), "--port", "0",
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--page-kb", str(args.page_kb),
+        "--tail-rate", str(args.tail_rate), "--tail-latency", str(args.tail_latency),
+        "--slow-share", str(args.slow_share)
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if " on " not in line:
+        process.kill()
+        raise RuntimeError(f"Fake server did not start: {line!r}")
+    return process, line.rsplit(" on ", 1)[1].strip()
+
+
+def run_case(url, args, engine, workers, channels, hedge):
+    params = {"url": url, "engine": engine, "workers": workers, "channels": channels, "timeout": args.timeout,
+              "hedge": hedge, "warm": args.warm}
+    command = [sys.executable, str(Path(__file__).resolve()), "--child", json.dumps(params)]
+    with tempfile.TemporaryDirectory() as work:
+        if args.warm:
+            subprocess.run(command, cwd=work, capture_output=True, text=True)
+        server_stats(url, reset=True)
+        output = subprocess.run(command, cwd=work, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"{engine}/{workers}/{channels} failed:\n{output.stderr[-2000:]}")
+    if args.verbose:
+        sys.stderr.write(output.stderr)
+    row = {"engine": engine, "workers": workers, "hedge": hedge}
+    row.update(json.loads(output.stdout.strip().splitlines()[-1]))
+    stats = server_stats(url)
+    row.update(requests=stats["requests"], kb_sent=round(stats["bytes"] / 1024), errors=stats["errors"])
+    return row
+
+
+def row_key(row):
+    return row["engine"], row["workers"], row["channels"], row.get("hedge", "off")
+
+
+def print_rows(rows, baseline):
+    header = (f"{'engine':<8}{'hedge':>6}{'workers':>8}{'channels':>9}{'resolved':>9}{'secs':>8}{'pages/s':>9}"
+              f"{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'ch p99':>8}{'RSS MB':>8}{'KB sent':>9}{'requests':>9}{'errors':>7}")
+    if baseline:
+        header += f"{'Δ pages/s':>11}{'Δ p95':>8}"
+    print(header)
+    before = {row_key(row): row for row in baseline}
+    for row in rows:
+        line = (f"{row['engine']:<8}{row.get('hedge', 'off'):>6}{row['workers']:>8}{row['channels']:>9}{row['resolved']:>9}"
+                f"{row['seconds']:>8.2f}{row['pages_per_s'] or 0:>9.1f}{row['p50_ms'] or 0:>8.1f}"
+                f"{row['p95_ms'] or 0:>8.1f}{row['p99_ms'] or 0:>8.1f}{row.get('channel_p99_ms') or 0:>8.1f}"
+                f"{row['peak_rss_mb']:>8.1f}"
+                f"{row['kb_sent']:>9}{row['requests']:>9}{row['errors']:>7}")
+        old = before.get(row_key(row))
+        if old and old.get("pages_per_s") and old.get("p95_ms"):
+            line += (f"{(row['pages_per_s'] or 0) / old['pages_per_s'] - 1:>+11.0%}"
+                     f"{(row['p95_ms'] or 0) / old['p95_ms'] - 1:>+8.0%}")
+        print(line)
+
+
+def int_list(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int_list, default=[100, 1000])
+    parser.add_argument("--workers", type=int_list, default=[5, 15, 30])
+    parser.add_argument("--engines", default="threads,asyncio")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--page-kb", type=float, default=20)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of requests that straggle")
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--slow-share", type=float, default=0.0, help="share of channels that are always slow")
+    parser.add_argument("--hedge", default="off", help="off, on or off,on")
+    parser.add_argument("--warm", action="store_true", help="measure a second run with latency history")
+    parser.add_argument("--timeout", type=int, default=15)
+    parser.add_argument("--save", help="write the result rows to this JSON file")
+    parser.add_argument("--baseline", help="compare against rows saved with --save")
+    parser.add_argument("--verbose", action="store_true", help="show the scraper's log")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(json.loads(args.child))
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())["rows"] if args.baseline else []
+    server, url = start_server(args)
+    rows = []
+    try:
+        for engine in args.engines.split(","):
+            for channels in args.channels:
+                for workers in args.workers:
+                    for hedge in args.hedge.split(","):
+                        rows.append(run_case(url, args, engine, workers, channels, hedge))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"latency {args.latency}s ±{args.jitter}s, error rate {args.error_rate:.0%}, "
+          f"tail {args.tail_rate:.0%} + {args.slow_share:.0%} slow channels at {args.tail_latency}s, "
+          f"{args.page_kb:g} KB pages, {os.cpu_count()} CPUs")
+    print_rows(rows, baseline)
+    if args.save:
+        settings = {k: getattr(args, k) for k in ("latency", "jitter", "error_rate", "page_kb", "timeout",
+                                                  "tail_rate", "tail_latency", "slow_share", "warm")}
+        Path(args.save).write_text(json.dumps({"settings": settings, "rows": rows}, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
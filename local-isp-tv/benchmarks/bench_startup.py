@@ -0,0 +1,59 @@
+"""Startup cost: what the app imports before its first frame vs. on first scrape
+
+Usage: python benchmarks/bench_startup.py [runs] [startup.jsonl ...]
+
+Times cold imports in fresh interpreters: app_config, which the app needs
+at startup, and scraper, the stack it now loads on the first scrape. Pass
+startup logs pulled from devices (cache/startup.jsonl, written by the app
+on every launch) to also get per-version medians of import time and time
+to first frame.
+"""
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+MODULES = ["app_config", "scraper"]
+
+
+def import_time(module):
+    code = (
+        "import sys, time; sys.path.insert(0, %r); start = time.perf_counter(); "
+        "import %s; print(time.perf_counter() - start)" % (str(APP_DIR), module)
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+
+def report_logs(paths):
+    by_version = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    by_version[entry.get("version", "?")].append(entry)
+    print(f"\n{'version':<10}{'launches':>9}{'imports':>10}{'first frame':>13}")
+    for version, entries in sorted(by_version.items()):
+        imports = statistics.median(e["imports"] for e in entries)
+        first_frame = statistics.median(e["first_frame"] for e in entries)
+        print(f"{version:<10}{len(entries):>9}{imports:>9.3f}s{first_frame:>12.3f}s")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':<12}{'median':>10}{'min':>10}   ({runs} cold imports)")
+    for module in MODULES:
+        times = [import_time(module) for _ in range(runs)]
+        print(f"{module:<12}{statistics.median(times) * 1000:>8.1f}ms{min(times) * 1000:>8.1f}ms")
+    if len(sys.argv) > 2:
+        report_logs(sys.argv[2:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,10 @@ package.name = localiptv
 package.domain = org.localiptv
 source.dir = .
 source.include_exts = py,png,jpg,kv,atlas
-version = 1.0.0
+source.exclude_dirs = benchmarks,tools
+source.exclude_patterns = headless.py
+version.regex = __version__ = ["'](.*)["']
+version.filename = %(source.dir)s/main.py
 requirements = python3,kivy==2.3.0,kivymd==1.2.0,requests,beautifulsoup4,lxml,pyjnius
 presplash.filename = %(source.dir)s/presplash.png
 icon.filename = %(source.dir)s/icon.png
@@ -0,0 +1,259 @@
+"""On-disk caches used by the scraper
+
+Kept free of Kivy imports so the scraping code can use them from any thread.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse, parse_qsl
+
+from channel import Channel
+
+# Query parameters that carry an absolute unix expiry time
+EXPIRY_PARAMS = ("expires", "expire", "expiry", "exp", "e", "valid_until", "validto", "deadline")
+# Query parameters that carry a signed token which may embed a timestamp
+TOKEN_PARAMS = ("token", "tk", "hdnts", "hdnea", "auth", "wmsauthsign", "st")
+# Re-resolve a little before a signed URL actually expires
+EXPIRY_MARGIN = 120
+# Shortest learned lifetime of an unsigned stream URL
+MIN_LIFETIME = 1800
+# Weight of the newest sample in the per-stream latency average
+LATENCY_ALPHA = 0.3
+
+
+class JsonCache:
+    """Small key/value cache persisted as a JSON file"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.data = self.load()
+
+    def load(self):
+        """Load cache contents, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write cache contents atomically"""
+        with self.lock:
+            payload = json.dumps(self.data, separators=(",", ":"))
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Cache save error ({self.path}): {e}")
+
+
+class StreamCache(JsonCache):
+    """Resolved stream URLs keyed by "<provider>:<stream ID>"
+
+    Each entry stores the resolved URL, when it was resolved and when it
+    expires. The expiry comes from signed-URL parameters when present,
+    else from the lifetime learned for that channel, capped by the
+    configured TTL. Entries whose expiry comes from the URL or a learned
+    lifetime are marked "expiry_known".
+    """
+    def __init__(self, path, ttl):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def get(self, stream_id, now=None):
+        """Return the cached URL if it has not expired"""
+        if self.ttl <= 0:
+            return None
+        now = now or time.time()
+        with self.lock:
+            entry = self.data.get(str(stream_id))
+        if entry and entry.get("expires_at", 0) > now:
+            return entry.get("url")
+        return None
+
+    def put(self, stream_id, url, now=None):
+        """Store a freshly resolved URL"""
+        now = now or time.time()
+        with self.lock:
+            lifetime = self.learn_lifetime(self.data.get(str(stream_id)), url, now)
+            entry = {
+                "url": url,
+                "resolved_at": now,
+                "expires_at": self.expiry_for(url, now, lifetime)
+            }
+            if lifetime:
+                entry["lifetime"] = lifetime
+            if entry["expires_at"] < now + self.ttl:
+                # A signed expiry or learned lifetime, not just the TTL cap;
+                # only these are worth an incremental refresh
+                entry["expiry_known"] = True
+            self.data[str(stream_id)] = entry
+
+    def learn_lifetime(self, previous, url, now):
+        """How long an unsigned URL of this channel stays the same, or None if unknown
+
+        A changed URL was rotated within the time since the last resolve; an
+        unchanged one lasted at least that long, so the estimate grows again.
+        """
+        if not previous or url_expiry(url, now):
+            return None
+        age = now - previous.get("resolved_at", now)
+        lifetime = previous.get("lifetime")
+        if previous.get("url") != url:
+            return round(max(MIN_LIFETIME, min(lifetime or age, age)))
+        if lifetime:
+            return round(min(self.ttl, max(lifetime, age) * 1.5))
+        return None
+
+    def discard(self, stream_id):
+        """Drop an entry that could not be revalidated"""
+        with self.lock:
+            self.data.pop(str(stream_id), None)
+
+    def prune(self, keep_ids):
+        """Forget stream IDs (or provider cache keys) that are no longer listed"""
+        keep = {str(i) for i in keep_ids}
+        with self.lock:
+            for key in [k for k in self.data if k not in keep]:
+                del self.data[key]
+
+    def expiry_for(self, url, now, lifetime=None):
+        """Compute when a resolved URL should be re-resolved"""
+        expires_at = now + min(self.ttl, lifetime or self.ttl)
+        signed = url_expiry(url, now)
+        if signed:
+            expires_at = min(expires_at, signed - EXPIRY_MARGIN)
+        return expires_at
+
+
+class LatencyHistory(JsonCache):
+    """Smoothed resolve time per channel cache key, in seconds
+
+    Used to start the historically slow channels first, so they do not
+    become the tail of a run.
+    """
+    def __init__(self, path, alpha=LATENCY_ALPHA):
+        super().__init__(path)
+        self.alpha = alpha
+
+    def observe(self, key, seconds):
+        with self.lock:
+            previous = self.data.get(key)
+            if previous is not None:
+                seconds = previous + self.alpha * (seconds - previous)
+            self.data[key] = round(seconds, 4)
+
+    def order(self, channels):
+        """Channels sorted slowest first; unknown ones count as the median"""
+        with self.lock:
+            known = sorted(self.data.values())
+            latency = dict(self.data)
+        if not known:
+            return list(channels)
+        median = known[len(known) // 2]
+        return sorted(channels, key=lambda ch: latency.get(ch["key"], median), reverse=True)
+
+    def values(self, prefix=""):
+        """Sorted latencies of the keys starting with prefix"""
+        with self.lock:
+            return sorted(v for k, v in self.data.items() if k.startswith(prefix))
+
+    def prune(self, keep_keys):
+        """Forget channels that are no longer listed"""
+        keep = set(keep_keys)
+        with self.lock:
+            for key in [k for k in self.data if k not in keep]:
+                del self.data[key]
+
+
+class IndexCache(JsonCache):
+    """Validators and parsed channel list of the last channel index fetch"""
+    def conditional_headers(self, url):
+        """Headers for a conditional GET of the index page"""
+        headers = {}
+        if self.data.get("url") != url or not self.data.get("channels"):
+            return headers
+        if self.data.get("etag"):
+            headers["If-None-Match"] = self.data["etag"]
+        if self.data.get("last_modified"):
+            headers["If-Modified-Since"] = self.data["last_modified"]
+        return headers
+
+    def channels_for(self, url, body=None):
+        """Cached channels if the page is unchanged, else None
+
+        Without a body the caller got a 304; with one, the body hash decides.
+        """
+        if self.data.get("url") != url or not self.data.get("channels"):
+            return None
+        if body is not None and self.data.get("hash") != content_hash(body):
+            return None
+        return [Channel.from_dict(ch) for ch in self.data["channels"]]
+
+    def update(self, url, response_headers, body, channels):
+        """Remember a freshly parsed index page"""
+        with self.lock:
+            self.data = {
+                "url": url,
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "hash": content_hash(body),
+                "channels": [dict(ch) for ch in channels]
+            }
+
+    def refresh_validators(self, response_headers):
+        """Keep the newest validators when the body hash matched"""
+        with self.lock:
+            if response_headers.get("ETag"):
+                self.data["etag"] = response_headers["ETag"]
+            if response_headers.get("Last-Modified"):
+                self.data["last_modified"] = response_headers["Last-Modified"]
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def git_blob_sha(content):
+    """SHA-1 git (and the GitHub API) assigns to a file with this content"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def url_expiry(url, now=None):
+    """Extract an absolute expiry time from a signed stream URL, if any"""
+    now = now or time.time()
+    try:
+        params = parse_qsl(urlparse(url).query, keep_blank_values=True)
+    except ValueError:
+        return None
+
+    for key, value in params:
+        key = key.lower()
+        if key in EXPIRY_PARAMS and value.isdigit():
+            ts = _as_timestamp(int(value), now)
+            if ts:
+                return ts
+        if key in TOKEN_PARAMS:
+            # Tokens such as "abc123-1700000000" or "exp=1700000000~hmac=..."
+            for digits in re.findall(r"(?<!\d)(\d{10}|\d{13})(?!\d)", value):
+                ts = _as_timestamp(int(digits), now)
+                if ts:
+                    return ts
+    return None
+
+
+def _as_timestamp(value, now):
+    """Interpret a number as a future unix timestamp (seconds or millis)"""
+    if value > 10 ** 12:
+        value //= 1000
+    # Only trust values that are in the future and within a week
+    if now < value < now + 7 * 86400:
+        return value
+    return None
@@ -0,0 +1,75 @@
+"""Compact channel records
+
+Merged portals give playlists of tens of thousands of channels, so a
+channel is a slotted object rather than a dict: no per-record hash table,
+and fields that are not set cost nothing. It reads and writes like the
+dict it replaces (ch["url"], ch.get("status"), "status" in ch, dict(ch)),
+so the pipeline and the JSON caches keep using the dict form. Strings that
+many channels share (category, provider, logo) are interned, so each
+distinct value is stored once.
+"""
+import sys
+
+FIELDS = ("name", "id", "logo", "category", "key", "provider", "url", "status", "latency")
+FIELD_SET = frozenset(FIELDS)
+INTERNED = frozenset(("logo", "category", "provider"))
+
+
+class Channel:
+    __slots__ = FIELDS
+    # Mutable and compared by value, like a dict
+    __hash__ = None
+
+    def __init__(self, **fields):
+        for field, value in fields.items():
+            self[field] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """Record from its dict form, e.g. a cached JSON entry; unknown keys are dropped"""
+        channel = cls()
+        for field, value in data.items():
+            if field in FIELD_SET:
+                channel[field] = value
+        return channel
+
+    def __getitem__(self, field):
+        if field in FIELD_SET:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                pass
+        raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        if field not in FIELD_SET:
+            raise KeyError(f"Channel has no field {field!r}")
+        if field in INTERNED and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in FIELD_SET and hasattr(self, field)
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [field for field in FIELDS if hasattr(self, field)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Channel, dict)):
+            return dict(self) == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Channel({dict(self)!r})"
@@ -0,0 +1,290 @@
+"""Channel index parser backends
+
+Every backend turns the index page into the same list of channel.Channel
+records with "name", "id", "logo" and "category", in document order:
+
+- lxml: incremental libxml2 parse, one channel subtree at a time (fastest,
+  shipped in the APK requirements)
+- selectolax: Lexbor (or older Modest) CSS engine, when installed
+- stream: dependency-free html.parser event handler that emits records while
+  reading ul#vidlink, without building a tree
+- bs4: the original BeautifulSoup + html.parser implementation
+
+"auto" picks the first available of lxml, selectolax and stream.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from channel import Channel
+
+STREAM_ID_RE = re.compile(r"stream=(\d+)")
+AUTO_ORDER = ("lxml", "selectolax", "stream")
+# Characters of the index page fed to the incremental lxml parser at a time
+PARSE_CHUNK = 64 * 1024
+
+
+def make_record(base_url, name, src, onclick, classes):
+    """Build a channel record, or None if the <li> has no stream ID or is malformed"""
+    match = STREAM_ID_RE.search(onclick or "")
+    if not match:
+        return None
+    categories = [c for c in classes if c != "All"]
+    try:
+        logo = urljoin(base_url, src or "")
+    except ValueError as e:
+        # e.g. a malformed IPv6 host; one bad entry must not abort the index
+        print(f"Error parsing channel: {e}")
+        return None
+    return Channel(
+        name=(name or "").strip(),
+        id=match.group(1),
+        logo=logo,
+        category=categories[0] if categories else "Uncategorized"
+    )
+
+
+def parse_bs4(html, base_url):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    channels = []
+    for li in soup.select("ul#vidlink li"):
+        try:
+            anchor = li.find("a", {"onclick": True})
+            if not anchor:
+                continue
+            img = anchor.find("img")
+            if not img:
+                continue
+            record = make_record(base_url, img.get("alt", ""), img.get("src", ""),
+                                 anchor.get("onclick", ""), li.get("class", []))
+        except Exception as e:
+            print(f"Error parsing channel: {e}")
+            continue
+        if record:
+            channels.append(record)
+    return channels
+
+
+def parse_lxml(html, base_url):
+    """libxml2 push parse that keeps only the current <li> subtree
+
+    Each outermost ul#vidlink <li> is turned into records when it closes,
+    then cleared, so a large index never exists as a whole tree. Records
+    and their order match //ul[@id="vidlink"]//li on the full document.
+    """
+    from lxml import etree
+    parser = etree.HTMLPullParser(events=("end",), tag="li")
+
+    channels = []
+    for start in range(0, len(html), PARSE_CHUNK):
+        parser.feed(html[start:start + PARSE_CHUNK])
+        collect_closed_items(parser, base_url, channels)
+    root = parser.close()
+    collect_closed_items(parser, base_url, channels)
+    # libxml2 stops reporting closing tags past its nesting limit; whatever
+    # was not collected is still in the tree (collected items were cleared)
+    channels.extend(lxml_records(root.xpath('//ul[@id="vidlink"]//li'), base_url))
+    return channels
+
+
+def collect_closed_items(parser, base_url, channels):
+    for _, li in parser.read_events():
+        inside, nested = vidlink_placement(li)
+        if not inside or nested:
+            continue
+        channels.extend(lxml_records([li, *li.iterdescendants("li")], base_url))
+        li.clear()
+        while li.getprevious() is not None:
+            del li.getparent()[0]
+
+
+def vidlink_placement(li):
+    """(inside ul#vidlink, inside another <li> that is inside ul#vidlink)"""
+    inside = nested = False
+    for ancestor in reversed(list(li.iterancestors())):
+        if ancestor.tag == "ul" and ancestor.get("id") == "vidlink":
+            inside = True
+        elif ancestor.tag == "li" and inside:
+            nested = True
+    return inside, nested
+
+
+def lxml_records(items, base_url):
+    """Record per <li>: its first <a onclick> descendant and the first <img> in that"""
+    records = []
+    for li in items:
+        anchor = first_descendant(li, "a", "onclick")
+        img = first_descendant(anchor, "img") if anchor is not None else None
+        if img is None:
+            continue
+        record = make_record(base_url, img.get("alt", ""), img.get("src", ""),
+                             anchor.get("onclick", ""), li.get("class", "").split())
+        if record:
+            records.append(record)
+    return records
+
+
+def first_descendant(element, tag, attribute=None):
+    for found in element.iterdescendants(tag):
+        if attribute is None or found.get(attribute) is not None:
+            return found
+    return None
+
+
+def selectolax_parser():
+    """Lexbor backend on selectolax >= 0.3.13, Modest before that"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser as ModestHTMLParser
+        return ModestHTMLParser
+
+
+def parse_selectolax(html, base_url):
+    tree = selectolax_parser()(html)
+
+    channels = []
+    for li in tree.css("ul#vidlink li"):
+        anchor = li.css_first("a[onclick]")
+        if anchor is None:
+            continue
+        img = anchor.css_first("img")
+        if img is None:
+            continue
+        attrs = img.attributes
+        record = make_record(base_url, attrs.get("alt") or "", attrs.get("src") or "",
+                             anchor.attributes.get("onclick") or "",
+                             (li.attributes.get("class") or "").split())
+        if record:
+            channels.append(record)
+    return channels
+
+
+class ChannelStreamParser(HTMLParser):
+    """Emit channel records from ul#vidlink parser events, without a tree
+
+    Mirrors the bs4 semantics: for every <li> inside ul#vidlink (nested ones
+    included) take the first <a onclick> below it and the first <img> inside
+    that anchor.
+    """
+    def __init__(self, base_url, emit):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.emit = emit
+        self.ul_depth = 0      # <ul> nesting inside ul#vidlink, 0 = outside
+        self.open_items = []   # <li> elements not closed yet, outermost first
+        self.closed_items = [] # nested <li> elements waiting for their parent
+        self.opened = 0        # <li> start tags seen, for document order
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "ul":
+            if self.ul_depth:
+                self.ul_depth += 1
+            elif dict(attrs).get("id") == "vidlink":
+                self.ul_depth = 1
+            return
+        if not self.ul_depth:
+            return
+
+        if tag == "li":
+            classes = (dict(attrs).get("class") or "").split()
+            self.open_items.append([classes, None, False, None, self.opened])
+            self.opened += 1
+        elif tag == "a":
+            onclick = dict(attrs).get("onclick")
+            if onclick is not None:
+                for item in self.open_items:
+                    if item[1] is None:
+                        item[1] = onclick
+                        item[2] = True
+        elif tag == "img":
+            for item in self.open_items:
+                if item[2] and item[3] is None:
+                    item[3] = dict(attrs)
+
+    def handle_endtag(self, tag):
+        if not self.ul_depth:
+            return
+        if tag == "a":
+            for item in self.open_items:
+                item[2] = False
+        elif tag == "li" and self.open_items:
+            self.close_item()
+        elif tag == "ul":
+            self.ul_depth -= 1
+            if not self.ul_depth:
+                while self.open_items:
+                    self.close_item()
+
+    def close_item(self):
+        item = self.open_items.pop()
+        if self.open_items:
+            self.closed_items.append(item)
+            return
+        # Outermost <li> done: emit it and its nested items in start-tag order
+        for done in sorted([item, *self.closed_items], key=lambda i: i[4]):
+            self.emit_item(done)
+        self.closed_items = []
+
+    def emit_item(self, item):
+        classes, onclick, _, img, _ = item
+        if onclick is None or img is None:
+            return
+        record = make_record(self.base_url, img.get("alt") or "", img.get("src") or "", onclick, classes)
+        if record:
+            self.emit(record)
+
+    def close(self):
+        super().close()
+        while self.open_items:
+            self.close_item()
+
+
+def parse_stream(html, base_url):
+    channels = []
+    parser = ChannelStreamParser(base_url, channels.append)
+    parser.feed(html)
+    parser.close()
+    return channels
+
+
+PARSERS = {
+    "lxml": parse_lxml,
+    "selectolax": parse_selectolax,
+    "stream": parse_stream,
+    "bs4": parse_bs4
+}
+
+
+def backend_available(name):
+    """Whether the optional dependency of a backend is importable"""
+    try:
+        if name == "lxml":
+            import lxml.html
+        elif name == "selectolax":
+            selectolax_parser()
+        elif name == "bs4":
+            import bs4
+        return name in PARSERS
+    except ImportError:
+        return False
+
+
+def resolve_backend(name="auto"):
+    """Map a configured backend name to one that can run here"""
+    if name in PARSERS and backend_available(name):
+        return name
+    if name != "auto":
+        print(f"Parser backend '{name}' unavailable, using auto")
+    for candidate in AUTO_ORDER:
+        if backend_available(candidate):
+            return candidate
+    return "stream"
+
+
+def parse_channels(html, base_url, backend="auto"):
+    """Extract channel records from the index page with the given backend"""
+    return PARSERS[resolve_backend(backend)](html, base_url)
@@ -0,0 +1,182 @@
+"""Adaptive concurrency control for the resolver fan-out
+
+AIMDController adjusts a concurrency limit from request outcomes:
+
+- slow start: +1 per success until the first sign of congestion
+- then additive increase of about +1 per round of `limit` successes
+- multiplicative decrease on timeouts, HTTP 429/5xx, or when the smoothed
+  latency climbs well above the best latency seen (latency gradient)
+
+Decreases are spaced at least one smoothed latency apart, so a burst of
+failures from the same congested moment counts once. The configured worker
+count is the upper bound.
+
+completed_in_window() feeds a thread pool from an iterator, so only a
+window of futures exists at a time however many channels there are.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from itertools import islice
+
+from cache import JsonCache
+
+# Futures submitted ahead per worker thread: enough to never leave one idle
+WINDOW_PER_WORKER = 2
+
+_save_lock = threading.Lock()
+
+
+class AIMDController:
+    """Concurrency limit driven by latency and overload signals"""
+    def __init__(self, initial, maximum, minimum=1, backoff=0.5, latency_tolerance=2.5, slow_start=True):
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.slow_start = slow_start
+        self.lock = threading.Lock()
+        self.min_latency = None
+        self.avg_latency = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.peak = self.limit
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def on_success(self, latency):
+        with self.lock:
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+
+            if self.avg_latency > self.latency_tolerance * max(self.min_latency, 0.05):
+                # Queues are building up somewhere: back off gently
+                self._decrease(0.9)
+                return
+            if self.slow_start:
+                self.limit += 1
+            else:
+                self.limit += 1.0 / self.limit
+            self.limit = min(self.limit, self.maximum)
+            self.peak = max(self.peak, self.limit)
+
+    def on_overload(self):
+        """Timeout, HTTP 429 or 5xx from the server"""
+        with self.lock:
+            self.slow_start = False
+            self._decrease(self.backoff)
+
+    def _decrease(self, factor):
+        now = time.monotonic()
+        if now - self.last_decrease < (self.avg_latency or 0.5):
+            return
+        self.last_decrease = now
+        self.decreases += 1
+        self.limit = max(self.minimum, self.limit * factor)
+        # Latency recovers slowly; forget the old minimum a little
+        if self.min_latency is not None:
+            self.min_latency *= 1.1
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 1),
+            "peak": round(self.peak, 1),
+            "decreases": self.decreases,
+            "min_latency": round(self.min_latency or 0, 3),
+            "avg_latency": round(self.avg_latency or 0, 3)
+        }
+
+
+class AdaptiveLimiter:
+    """Blocking gate for worker threads that follows the controller's limit"""
+    def __init__(self, controller):
+        self.controller = controller
+        self.cond = threading.Condition()
+        self.active = 0
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= self.controller.current:
+                self.cond.wait(0.5)
+            self.active += 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self.controller
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AsyncAdaptiveLimiter:
+    """asyncio counterpart of AdaptiveLimiter, for the event loop engine"""
+    def __init__(self, controller):
+        self.controller = controller
+        self.cond = asyncio.Condition()
+        self.active = 0
+
+    async def __aenter__(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.controller.current)
+            self.active += 1
+        return self.controller
+
+    async def __aexit__(self, *exc):
+        async with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+
+def completed_in_window(executor, fn, items, window, cancel):
+    """Yield (item, future) as each fn(item) completes, with at most `window` submitted
+
+    A finished future is replaced before it is handed out, so the pool stays
+    busy. Once the CancelToken is set nothing more is submitted and the
+    generator returns at once; futures still running are abandoned.
+    """
+    items = iter(items)
+    running = {}
+    stopped = Future()
+    unregister = cancel.on_cancel(lambda: stopped.set_result(None))
+    try:
+        for item in islice(items, max(1, window)):
+            running[executor.submit(fn, item)] = item
+        while running and not stopped.done():
+            done, _ = wait([stopped, *running], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future is stopped:
+                    continue
+                item = running.pop(future)
+                if not stopped.done():
+                    for upcoming in islice(items, 1):
+                        running[executor.submit(fn, upcoming)] = upcoming
+                yield item, future
+    finally:
+        unregister()
+
+
+def load_controller(path, key, maximum, cold_start=4):
+    """Controller starting near the limit a previous run settled on, else low"""
+    saved = JsonCache(path).data.get(key)
+    if saved:
+        return AIMDController(min(int(saved), maximum), maximum, slow_start=False)
+    return AIMDController(min(cold_start, maximum), maximum)
+
+
+def save_controller(path, key, controller):
+    """Remember the settled limit for the next run"""
+    # Providers resolve in parallel and share the file
+    with _save_lock:
+        store = JsonCache(path)
+        store.data[key] = round(controller.limit, 1)
+        store.save()
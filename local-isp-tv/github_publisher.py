@@ -0,0 +1,117 @@
+"""Multi-file publishing through the GitHub Git Data API
+
+publish() writes any number of files as a single commit:
+blobs -> tree -> commit -> ref update. Only files whose git blob SHA differs
+from the remote (or from the SHAs remembered after the last publish) are
+uploaded; when nothing changed no request is made at all. Files a previous
+publish wrote that are no longer in the set (e.g. per-category playlists
+after that option is turned off, or pruned logos) are deleted in the same
+commit. Only paths remembered in state_path count as ours, so without it
+(or after it is lost) such files stay in the repository.
+"""
+import base64
+import time
+
+from cache import JsonCache, git_blob_sha
+
+GITHUB_API = "https://api.github.com"
+
+
+class PublishError(Exception):
+    pass
+
+
+class GitDataPublisher:
+    def __init__(self, client, repo, branch, token, api_url=GITHUB_API, state_path=None, metrics=None, cancel=None):
+        self.client = client
+        self.metrics = metrics
+        # Checked before every request; the ref update is the only step that publishes
+        self.cancel = cancel
+        self.repo = repo
+        self.branch = branch
+        self.api = f"{api_url.rstrip('/')}/repos/{repo}/git"
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        self.state = JsonCache(state_path) if state_path else None
+        self.state_key = f"{repo}@{branch}"
+
+    def call(self, method, path, expected=(200, 201), **kwargs):
+        if self.cancel:
+            self.cancel.check()
+        start = time.monotonic()
+        response = self.client.request(method, f"{self.api}/{path}", headers=self.headers, timeout=15, **kwargs)
+        if self.metrics:
+            self.metrics.request("github", time.monotonic() - start,
+                                 received=len(response.content), sent=len(response.request.body or b""))
+        if response.status_code not in expected:
+            if self.metrics:
+                self.metrics.error("github", f"HTTP {response.status_code}")
+            raise PublishError(f"{method} {path}: {response.status_code} - {response.text[:200]}")
+        return response
+
+    def publish(self, files, message=None):
+        """Commit {path: bytes} to the branch; returns the changed and deleted paths"""
+        local = {path: git_blob_sha(content) for path, content in files.items()}
+        known = self.state.data.get(self.state_key, {}) if self.state else {}
+        # Published last time but no longer produced
+        stale = sorted(set(known.get("paths", {})) - set(local))
+        if known.get("paths") and not stale and all(known["paths"].get(p) == sha for p, sha in local.items()):
+            print("GitHub: all files unchanged since last publish")
+            return []
+
+        message = message or f"Update playlists {time.strftime('%Y-%m-%d %H:%M:%S')}"
+        # A concurrent push makes the ref update fail; rebuild on the new head once
+        for attempt in range(2):
+            head = self.call("GET", f"ref/heads/{self.branch}").json()["object"]["sha"]
+            base_tree = self.call("GET", f"commits/{head}").json()["tree"]["sha"]
+            if known.get("head") == head:
+                remote = known.get("paths", {})
+            else:
+                remote = self.remote_shas(base_tree, set(local) | set(stale))
+
+            changed = [p for p, sha in local.items() if remote.get(p) != sha]
+            deleted = [p for p in stale if p in remote]
+            if not changed and not deleted:
+                self.remember(head, local)
+                print("GitHub: remote already up to date")
+                return []
+
+            entries = []
+            for path in changed:
+                blob = self.call("POST", "blobs", json={
+                    "content": base64.b64encode(files[path]).decode("ascii"),
+                    "encoding": "base64"
+                }).json()
+                entries.append({"path": path, "mode": "100644", "type": "blob", "sha": blob["sha"]})
+            # A null SHA removes the path from the base tree
+            entries += [{"path": path, "mode": "100644", "type": "blob", "sha": None} for path in deleted]
+
+            tree = self.call("POST", "trees", json={"base_tree": base_tree, "tree": entries}).json()["sha"]
+            commit = self.call("POST", "commits", json={
+                "message": message, "tree": tree, "parents": [head]
+            }).json()["sha"]
+            response = self.call("PATCH", f"refs/heads/{self.branch}", expected=(200, 201, 422),
+                                 json={"sha": commit, "force": False})
+            if response.status_code != 422:
+                self.remember(commit, local)
+                print(f"GitHub: committed {len(changed)} file(s), deleted {len(deleted)} in {commit[:7]}")
+                return changed + deleted
+            if attempt:
+                raise PublishError(f"Ref update rejected: {response.text[:200]}")
+            known = {}
+        return []
+
+    def remote_shas(self, tree_sha, wanted):
+        """Blob SHAs of the wanted paths in a tree"""
+        tree = self.call("GET", f"trees/{tree_sha}", params={"recursive": "1"}).json()
+        if tree.get("truncated"):
+            # Huge repository: treat every file as changed
+            return {}
+        return {e["path"]: e["sha"] for e in tree.get("tree", []) if e.get("type") == "blob" and e["path"] in wanted}
+
+    def remember(self, head, paths):
+        if self.state:
+            self.state.data[self.state_key] = {"head": head, "paths": paths}
+            self.state.save()
@@ -0,0 +1,208 @@
+"""Headless runner: scrape, resolve, write and publish without Kivy
+
+    python headless.py run                 one full refresh, then exit
+    python headless.py refresh             re-resolve only streams about to expire
+    python headless.py daemon              full refresh every config.interval hours,
+                                           incremental ones before streams expire
+
+`daemon --serve` (or lan_server in config.json) also serves the playlists
+on the local network, see playlist_server.py.
+
+Reads the same config.json as the app. Pipeline logs go to stderr; every
+refresh prints one JSON status line to stdout, with phase timings and
+per-request stats, and appends its metrics report to cache/metrics.json.
+`run` exits with:
+
+    0  playlist written (and uploaded, when GitHub is configured)
+    1  the refresh failed
+    2  no stream could be resolved
+    3  the GitHub upload failed
+    4  cancelled by SIGINT/SIGTERM
+
+A refresh that runs out of its time budget (config.run_budget) still
+writes the channels resolved so far; its status line counts the rest as
+"skipped".
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+# Measured around the pipeline import, the part of startup this runner pays
+START = time.monotonic()
+import scraper
+from metrics import start_run
+from playlist_server import PlaylistServer
+from app_config import apply_settings, config, read_settings
+from resilience import Cancelled, CancelToken
+from scheduler import plan_refresh
+IMPORTED = time.monotonic()
+
+OK = 0
+FAILED = 1
+NOTHING_RESOLVED = 2
+UPLOAD_FAILED = 3
+CANCELLED = 4
+
+STATUS_NAMES = {
+    OK: "ok",
+    FAILED: "failed",
+    NOTHING_RESOLVED: "nothing_resolved",
+    UPLOAD_FAILED: "upload_failed",
+    CANCELLED: "cancelled"
+}
+
+
+def load_config(args):
+    """Apply config.json, then the command-line overrides"""
+    apply_settings(read_settings(args.config))
+    scraper.M3U_FILE = Path(args.output)
+    if args.base_url:
+        scraper.BASE_URL = args.base_url
+        scraper.HEADERS["Referer"] = args.base_url
+    if args.provider:
+        config.providers = config.providers + args.provider
+    if args.github_api:
+        scraper.GITHUB_API = args.github_api
+    if args.no_upload:
+        config.token = ""
+    if args.mode == "daemon" and args.serve:
+        config.lan_server = True
+    if args.port:
+        config.lan_port = args.port
+
+
+def run_once(args, kind="full", cancel=None):
+    """One refresh; returns (exit code, status dict)"""
+    status = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "kind": kind}
+    run = start_run()
+    code = OK
+    log = open(os.devnull, "w") if args.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(log):
+            load_config(args)
+            refreshed = scraper.refresh_streams(cancel) if kind == "incremental" else None
+            if refreshed is not None:
+                due, changed = refreshed
+                status.update(refreshed=due, changed=changed, playlist=str(scraper.M3U_FILE))
+                upload = changed
+            else:
+                # Also the fallback when there is nothing published to refresh yet
+                status["kind"] = "full"
+                total, resolved = scraper.scrape_channels(cancel)
+                status.update(channels=total, resolved=resolved, skipped=run.counts.get("skipped", 0),
+                              playlist=str(scraper.M3U_FILE))
+                if not resolved:
+                    code = NOTHING_RESOLVED
+                upload = bool(resolved)
+            if upload and config.token and config.repo:
+                uploaded = scraper.upload_to_github(cancel)
+                status["uploaded"] = uploaded
+                if not uploaded:
+                    code = UPLOAD_FAILED
+    except Cancelled:
+        code = CANCELLED
+    except Exception as e:
+        code = FAILED
+        status["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if args.quiet:
+            log.close()
+    run.finish(STATUS_NAMES[code])
+    run.save(scraper.METRICS_FILE)
+    report = run.report()
+    status.update(
+        status=STATUS_NAMES[code],
+        exit_code=code,
+        timings=dict(report["phases"], total=report["total_s"]),
+        requests=report["requests"]
+    )
+    return code, status
+
+
+def emit(status):
+    print(json.dumps(status), flush=True)
+
+
+def cancel_on_signals(cancel):
+    """Let SIGINT/SIGTERM cancel the running refresh instead of killing it mid-write"""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: cancel.cancel("Stopped by signal"))
+
+
+def daemon(args):
+    """Refresh as planned by the scheduler until SIGINT/SIGTERM; starts with a full refresh"""
+    # One token for the daemon's lifetime: a signal stops the current run and the loop
+    stop = CancelToken()
+    cancel_on_signals(stop)
+    server = start_server(args)
+
+    kind = "full"
+    while not stop.cancelled():
+        apply_settings(read_settings(args.config))
+        interval = max(0.01, args.interval if args.interval else config.interval)
+        if config.paused:
+            print("Auto-refresh paused in config.json, checking again later", file=sys.stderr)
+            delay = interval * 3600
+        else:
+            emit(run_once(args, kind, stop)[1])
+            if server:
+                with contextlib.redirect_stdout(sys.stderr):
+                    scraper.load_playlist_server(server)
+            # Plan from the end of the run, like the app's timer
+            kind, delay = plan_refresh(interval)
+            print(f"Next {kind} refresh in {delay / 60:.1f} min", file=sys.stderr)
+        stop.event.wait(delay)
+    if server:
+        server.stop()
+    return OK
+
+
+def start_server(args):
+    """The daemon's LAN playlist server serving the last playlist, or None when disabled"""
+    load_config(args)
+    if not config.lan_server:
+        return None
+    # Its log lines go with the pipeline's, stdout is for status lines
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            server = PlaylistServer(config.lan_port)
+        except OSError as e:
+            print(f"LAN server error: {e}")
+            return None
+        scraper.load_playlist_server(server)
+        return server.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["run", "refresh", "daemon"])
+    parser.add_argument("--config", default="config.json", help="app settings file (default: config.json)")
+    parser.add_argument("--output", default="channels.m3u", help="playlist path (default: channels.m3u)")
+    parser.add_argument("--base-url", help="site to scrape instead of the default")
+    parser.add_argument("--provider", action="append", default=[], metavar="URL",
+                        help="another portal to scrape and merge; repeatable")
+    parser.add_argument("--github-api", help="GitHub API root, e.g. a local tools/fake_github.py")
+    parser.add_argument("--no-upload", action="store_true", help="write the playlist but skip GitHub")
+    parser.add_argument("--interval", type=float, help="daemon interval in hours, overrides config.json")
+    parser.add_argument("--quiet", action="store_true", help="discard pipeline logs")
+    parser.add_argument("--serve", action="store_true", help="daemon: serve playlists on the LAN")
+    parser.add_argument("--port", type=int, help="LAN server port, overrides config.json")
+    args = parser.parse_args(argv)
+
+    if args.mode == "daemon":
+        return daemon(args)
+    cancel = CancelToken()
+    cancel_on_signals(cancel)
+    code, status = run_once(args, "incremental" if args.mode == "refresh" else "full", cancel)
+    status["timings"]["startup"] = round(IMPORTED - START, 3)
+    emit(status)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
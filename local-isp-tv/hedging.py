@@ -0,0 +1,126 @@
+"""Hedged requests for the resolver engines
+
+When a request is still running after the observed p95 latency, a second
+identical request is sent and whichever succeeds first is used. Hedges are
+capped at a small share of all requests so the extra load stays bounded.
+Until enough latencies have been seen in this run, the p95 of the
+per-stream latency history is used as the hedge delay.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metrics import percentile
+
+HEDGE_PERCENTILE = 95
+# Hedging past the p95 sends a backup for about 5% of requests; the cap
+# leaves headroom for that and stops a run-wide slowdown from doubling load
+MAX_HEDGE_RATIO = 0.1
+MIN_SAMPLES = 20
+MIN_DELAY = 0.05
+WINDOW = 500
+
+
+class Hedger:
+    def __init__(self, initial_delay=None, pct=HEDGE_PERCENTILE, max_ratio=MAX_HEDGE_RATIO,
+                 min_samples=MIN_SAMPLES, min_delay=MIN_DELAY):
+        self.initial_delay = initial_delay
+        self.pct = pct
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def observe(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there is no estimate"""
+        with self.lock:
+            if len(self.samples) >= self.min_samples:
+                estimate = percentile(sorted(self.samples), self.pct)
+            else:
+                estimate = self.initial_delay
+        return max(self.min_delay, estimate) if estimate is not None else None
+
+    def start(self):
+        with self.lock:
+            self.requests += 1
+
+    def allow(self):
+        """Take a hedge from the budget, if any is left"""
+        with self.lock:
+            if self.hedges + 1 > max(1, self.max_ratio * self.requests):
+                return False
+            self.hedges += 1
+            return True
+
+    def won(self):
+        with self.lock:
+            self.wins += 1
+
+    def timed(self, fn):
+        start = time.monotonic()
+        result = fn()
+        self.observe(time.monotonic() - start)
+        return result
+
+    def call(self, fn, executor):
+        """Run fn() on the executor, hedging it once if it is slow"""
+        self.start()
+        primary = executor.submit(self.timed, fn)
+        delay = self.delay()
+        if delay is None or wait([primary], timeout=delay).done or not self.allow():
+            return primary.result()
+
+        backup = executor.submit(self.timed, fn)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    # The loser keeps running in the background; its result is dropped
+                    if future is backup and future.exception() is None:
+                        self.won()
+                    return future.result()
+
+    async def acall(self, factory):
+        """Await factory(), hedging it once if it is slow; the loser is cancelled"""
+        self.start()
+        primary = asyncio.ensure_future(self.atimed(factory))
+        delay = self.delay()
+        if delay is not None:
+            await asyncio.wait({primary}, timeout=delay)
+        if delay is None or primary.done() or not self.allow():
+            return await primary
+
+        backup = asyncio.ensure_future(self.atimed(factory))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        if task is backup and task.exception() is None:
+                            self.won()
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def atimed(self, factory):
+        start = time.monotonic()
+        result = await factory()
+        self.observe(time.monotonic() - start)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.wins}
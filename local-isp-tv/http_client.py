@@ -0,0 +1,140 @@
+"""Shared HTTP client for the scraper, resolver and GitHub uploader"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+from urllib3.util import Timeout
+
+# Distinct hosts we talk to: the channel site, its CDN redirects and GitHub
+HOST_POOLS = 8
+# Longest wait for a free pooled connection when a request has no timeout
+POOL_TIMEOUT = 30
+
+
+def pool_wait(timeout):
+    """Seconds to wait for a free connection: the request's connect timeout"""
+    if isinstance(timeout, Timeout) and isinstance(timeout.connect_timeout, (int, float)):
+        return timeout.connect_timeout
+    return POOL_TIMEOUT
+
+
+class BoundedWaitPool(HTTPConnectionPool):
+    """Connection pool whose wait for a free socket ends with the request's timeout"""
+    def urlopen(self, method, url, *args, **kwargs):
+        if kwargs.get("pool_timeout") is None:
+            kwargs["pool_timeout"] = pool_wait(kwargs.get("timeout"))
+        return super().urlopen(method, url, *args, **kwargs)
+
+
+class BoundedWaitHTTPSPool(BoundedWaitPool, HTTPSConnectionPool):
+    pass
+
+
+class BoundedWaitAdapter(HTTPAdapter):
+    """HTTPAdapter with blocking pools that give up instead of waiting forever
+
+    A request that finds every connection to its host busy (e.g. held by
+    abandoned hedge losers) fails with ConnectTimeout after its own connect
+    timeout, which the Guard already clamps to the run deadline.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": BoundedWaitPool, "https": BoundedWaitHTTPSPool}
+
+    def send(self, request, *args, **kwargs):
+        try:
+            return super().send(request, *args, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.ConnectTimeout(e, request=request)
+
+
+class HttpClient:
+    """requests.Session with keep-alive pools sized for the resolver fan-out"""
+    def __init__(self, pool_size=15, per_host=None):
+        self.pool_size = pool_size
+        self.per_host = per_host or pool_size
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+        # pool_block keeps at most per_host sockets open to a single host;
+        # extra workers wait for a free connection instead of opening more,
+        # but no longer than their request's connect timeout
+        adapter = BoundedWaitAdapter(
+            pool_connections=HOST_POOLS,
+            pool_maxsize=self.per_host,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the shared pools"""
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def stats(self):
+        """Connection pool statistics summed over all hosts"""
+        opened = requests_sent = 0
+        hosts = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                hosts += 1
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+        return {
+            "hosts": hosts,
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(requests_sent - opened, 0),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def is_overload_error(exc):
+    """Whether a request error means the server is congested"""
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def shared_client(pool_size):
+    """Return the process-wide client, rebuilding it if the pool size changed"""
+    global _client
+    with _client_lock:
+        if _client is None or _client.pool_size != pool_size:
+            # An old client still in use by a running scrape is left to the GC
+            _client = HttpClient(pool_size)
+        return _client
@@ -0,0 +1,238 @@
+"""Local mirror of channel logos
+
+Downloads each distinct tvg-logo once into a content-addressed directory
+(file name = SHA-256 of the stored bytes) and points the playlist at the
+copies where other devices reach them (published next to the playlist or
+served on the LAN), so players stop fetching every logo from the portal
+on every view.
+Later runs revalidate a copy with If-None-Match / If-Modified-Since once
+it is older than LOGO_TTL; a 304 costs no body. Logos can be shrunk and
+recompressed to PNG when Pillow is installed; without it they are stored
+as downloaded.
+"""
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import JsonCache
+from concurrency import WINDOW_PER_WORKER, completed_in_window
+from resilience import CancelToken
+
+LOGO_TIMEOUT = 10
+# Revalidate a mirrored logo with the portal after this many seconds
+LOGO_TTL = 24 * 3600
+# Larger responses are not logos
+LOGO_MAX_BYTES = 1024 * 1024
+# Leading bytes -> file extension of the image formats players draw
+LOGO_TYPES = (
+    (b"\x89PNG", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF8", ".gif"),
+    (b"RIFF", ".webp"),
+    (b"<svg", ".svg"),
+    (b"<?xml", ".svg")
+)
+
+
+def logo_extension(data):
+    """File extension for image bytes, or None if they are not an image"""
+    head = data[:16].lstrip()
+    for magic, extension in LOGO_TYPES:
+        if head.startswith(magic):
+            if extension == ".webp" and head[8:12] != b"WEBP":
+                return None
+            return extension
+    return None
+
+
+def shrink_logo(data, size):
+    """Fit a raster logo into size x size px as an optimized PNG
+
+    Returns the original bytes when Pillow is missing, the image cannot be
+    decoded (e.g. SVG) or the PNG would not be smaller at the same size.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            resized = max(image.size) > size
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                image = image.convert("RGBA")
+            out = io.BytesIO()
+            image.save(out, "PNG", optimize=True)
+    except Exception as e:
+        print(f"Logo not resized: {e}")
+        return data
+    png = out.getvalue()
+    return png if resized or len(png) < len(data) else data
+
+
+class LogoCache(JsonCache):
+    """Mirrored logos keyed by their portal URL
+
+    Each entry holds the stored file name, the ETag / Last-Modified the
+    portal sent, when it was last checked and the size it was shrunk to
+    (0 = stored as downloaded).
+    """
+    def __init__(self, path, directory):
+        super().__init__(path)
+        self.directory = directory
+
+    def file(self, url):
+        """Name of the mirrored copy of a logo, or None"""
+        entry = self.data.get(url)
+        if entry and (self.directory / entry["file"]).exists():
+            return entry["file"]
+        return None
+
+    def fresh(self, url, size, now=None):
+        """Whether the copy can be used without asking the portal"""
+        entry = self.data.get(url)
+        now = now or time.time()
+        return (self.file(url) is not None and entry.get("size") == size
+                and entry.get("checked_at", 0) + LOGO_TTL > now)
+
+    def validators(self, url, size):
+        """Conditional request headers for a logo we have a usable copy of"""
+        entry = self.data.get(url)
+        if not self.file(url) or entry.get("size") != size:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, data, etag, last_modified, size):
+        """Write the logo under its content hash unless already there"""
+        name = hashlib.sha256(data).hexdigest()[:32] + logo_extension(data)
+        path = self.directory / name
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{name}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        with self.lock:
+            self.data[url] = {"file": name, "etag": etag, "last_modified": last_modified,
+                              "checked_at": time.time(), "size": size}
+
+    def touch(self, url):
+        """Record a 304: the copy is still current"""
+        with self.lock:
+            self.data[url]["checked_at"] = time.time()
+
+    def prune(self, urls):
+        """Forget logos no channel uses any more and delete unreferenced files"""
+        keep = set(urls)
+        with self.lock:
+            self.data = {url: entry for url, entry in self.data.items() if url in keep}
+            used = {entry["file"] for entry in self.data.values()}
+        if not self.directory.exists():
+            return
+        for path in self.directory.iterdir():
+            if path.name not in used:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    print(f"Logo cleanup error ({path}): {e}")
+
+    def files(self):
+        """Mirrored files that exist: {file name: Path}"""
+        with self.lock:
+            names = {entry["file"] for entry in self.data.values()}
+        return {name: self.directory / name for name in sorted(names) if (self.directory / name).exists()}
+
+    def location(self, url, base_url):
+        """URL of the mirrored copy of a logo under base_url, or None"""
+        name = self.file(url)
+        return base_url + name if name else None
+
+
+def fetch_logo(client, url, headers, timeout=LOGO_TIMEOUT, max_bytes=LOGO_MAX_BYTES):
+    """(HTTP status, body, ETag, Last-Modified) of a conditional logo GET"""
+    with client.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            return response.status_code, b"", None, None
+        body = b""
+        for chunk in response.iter_content(16 * 1024):
+            body += chunk
+            if len(body) > max_bytes:
+                raise ValueError(f"logo larger than {max_bytes // 1024} KB")
+        return 200, body, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+
+def mirror_logos(channels, client, headers_for, workers, cache, base_url, size=0, metrics=None, cancel=None):
+    """Mirror every channel's logo and rewrite channel["logo"] to base_url + copy
+
+    headers_for(channel) gives the request headers of the channel's
+    provider; a logo shared by several channels is fetched with those of
+    the first. Logos that fail to download keep a stale copy if there is
+    one, else their portal URL. Returns {"fresh", "revalidated",
+    "downloaded", "failed"}.
+    """
+    workers = max(1, workers)
+    cancel = cancel or CancelToken()
+    counts = {"fresh": 0, "revalidated": 0, "downloaded": 0, "failed": 0}
+    headers = {}
+    for ch in channels:
+        if ch.get("logo", "").startswith(("http://", "https://")) and ch["logo"] not in headers:
+            headers[ch["logo"]] = headers_for(ch)
+    to_fetch = []
+    for url in headers:
+        if cache.fresh(url, size):
+            counts["fresh"] += 1
+        else:
+            to_fetch.append(url)
+
+    def fetch(url):
+        start = time.monotonic()
+        result = fetch_logo(client, url, {**headers[url], **cache.validators(url, size)})
+        return result, time.monotonic() - start
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for url, future in completed_in_window(executor, fetch, to_fetch, workers * WINDOW_PER_WORKER, cancel):
+            try:
+                (status, body, etag, last_modified), seconds = future.result()
+            except Exception as e:
+                print(f"Logo download failed for {url}: {e}")
+                counts["failed"] += 1
+                if metrics:
+                    metrics.error("logo", type(e).__name__)
+                continue
+            if metrics:
+                metrics.request("logo", seconds, received=len(body))
+            if status == 304 and cache.file(url):
+                cache.touch(url)
+                counts["revalidated"] += 1
+            elif status == 200 and logo_extension(body):
+                cache.store(url, shrink_logo(body, size) if size else body, etag, last_modified, size)
+                counts["downloaded"] += 1
+            else:
+                print(f"Logo download failed for {url}: " + (f"HTTP {status}" if status != 200 else "not an image"))
+                counts["failed"] += 1
+                if metrics:
+                    metrics.error("logo", f"HTTP {status}" if status != 200 else "not an image")
+    finally:
+        executor.shutdown(wait=not cancel.cancelled(), cancel_futures=True)
+
+    rewritten = rewrite_logos(channels, cache, base_url)
+    print(f"Logo mirror: {counts}, {rewritten} channels use a mirrored logo")
+    return counts
+
+
+def rewrite_logos(channels, cache, base_url):
+    """Point channel["logo"] at mirrored copies, without any request; returns how many"""
+    rewritten = 0
+    for ch in channels:
+        location = cache.location(ch.get("logo", ""), base_url)
+        if location:
+            ch["logo"] = location
+            rewritten += 1
+    return rewritten
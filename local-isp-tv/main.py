@@ -1,34 +1,153 @@
+import time
+
+# Startup timing starts before Kivy is imported
+APP_START = time.perf_counter()
+
 from kivy.lang import Builder
 from kivy.uix.screenmanager import Screen, ScreenManager
 from kivymd.app import MDApp
-from kivymd.uix.button import MDRectangleFlatButton
-from kivymd.uix.dialog import MDDialog
 from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.metrics import dp
 from kivy.storage.jsonstore import JsonStore
 from kivy.utils import platform
-import requests
+from functools import lru_cache, partial
+from pathlib import Path
+import json
 import re
-import time
 import threading
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import base64
 
-# Android imports
-if platform == 'android':
+from app_config import SETTINGS, apply_settings, config
+
+IMPORTS_DONE = time.perf_counter()
+
+__version__ = "1.0.0"
+
+STARTUP_LOG = Path("cache") / "startup.jsonl"
+# Seconds between live progress updates during a refresh
+PROGRESS_INTERVAL = 0.25
+
+
+@lru_cache(maxsize=None)
+def android_class(name):
+    """Look up an Android Java class on first use"""
     from jnius import autoclass
-    PythonActivity = autoclass('org.kivy.android.PythonActivity')
-    activity = PythonActivity.mActivity
-    PowerManager = autoclass('android.os.PowerManager')
-    ConnectivityManager = autoclass('android.net.ConnectivityManager')
+    return autoclass(name)
+
+
+def android_activity():
+    return android_class('org.kivy.android.PythonActivity').mActivity
+
 
 KV = '''
 #:import dp kivy.metrics.dp
 
+<MainScreen>:
+    name: "main"
+    MDBoxLayout:
+        orientation: "vertical"
+        md_bg_color: app.theme_cls.bg_darkest
+        
+        MDTopAppBar:
+            title: "Local ISP TV Manager"
+            right_action_items: [["cog", lambda x: app.open_settings()]]
+            elevation: 2
+            size_hint_y: None
+            height: dp(56)
+        
+        MDBoxLayout:
+            orientation: "vertical"
+            padding: dp(20)
+            spacing: dp(15)
+            
+            MDCard:
+                orientation: "vertical"
+                padding: dp(15)
+                spacing: dp(10)
+                size_hint_y: None
+                height: dp(195)
+                elevation: 4
+                
+                MDLabel:
+                    text: "Status"
+                    font_style: "Subtitle1"
+                    size_hint_y: None
+                    height: dp(30)
+                    
+                MDLabel:
+                    id: status
+                    text: "Ready to scrape"
+                    font_style: "Body1"
+                    theme_text_color: "Hint"
+                    
+                MDLabel:
+                    id: metrics
+                    text: ""
+                    font_style: "Caption"
+                    theme_text_color: "Hint"
+                    
+                MDLabel:
+                    id: timer
+                    text: "Next refresh: --:--:--"
+                    font_style: "Caption"
+                    theme_text_color: "Hint"
+                    
+                MDLabel:
+                    id: lan
+                    text: ""
+                    font_style: "Caption"
+                    theme_text_color: "Hint"
+            
+            MDCard:
+                orientation: "vertical"
+                padding: dp(15)
+                spacing: dp(12)
+                size_hint_y: None
+                height: dp(260)
+                elevation: 4
+                
+                MDRaisedButton:
+                    text: "Scrape & Upload Now"
+                    size_hint_x: 1
+                    size_hint_y: None
+                    height: dp(48)
+                    md_bg_color: app.theme_cls.primary_color
+                    on_release: root.run()
+                    
+                MDRaisedButton:
+                    text: "Open in VLC"
+                    size_hint_x: 1
+                    size_hint_y: None
+                    height: dp(48)
+                    md_bg_color: (0.2, 0.6, 0.9, 1)
+                    on_release: root.vlc()
+                    
+                MDRaisedButton:
+                    id: pause_btn
+                    text: "Pause Auto-Refresh"
+                    size_hint_x: 1
+                    size_hint_y: None
+                    height: dp(48)
+                    md_bg_color: (0.9, 0.5, 0.2, 1)
+                    on_release: root.toggle_pause()
+                    
+                MDRaisedButton:
+                    id: cancel_btn
+                    text: "Cancel Refresh"
+                    size_hint_x: 1
+                    size_hint_y: None
+                    height: dp(48)
+                    disabled: True
+                    md_bg_color: (0.8, 0.3, 0.3, 1)
+                    on_release: root.cancel()
+            
+            Widget:
+'''
+
+# Built the first time the settings screen is opened
+SETTINGS_KV = '''
+#:import dp kivy.metrics.dp
+
 <SettingsScreen>:
     name: "settings"
     MDBoxLayout:
@@ -94,6 +213,33 @@ KV = '''
                     size_hint_y: None
                     height: dp(56)
                 
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Publish as one commit (Git Data API)"
+                    
+                    MDSwitch:
+                        id: gitdata
+                        pos_hint: {"center_y": .5}
+                
+                MDLabel:
+                    text: "Channel Sources"
+                    font_style: "H6"
+                    size_hint_y: None
+                    height: dp(40)
+                    padding_top: dp(10)
+                
+                MDTextField:
+                    id: providers
+                    hint_text: "Extra Portals (one URL per line)"
+                    multiline: True
+                    helper_text: "Scraped alongside redforce.live and merged, duplicates dropped"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: max(dp(56), self.minimum_height)
+                
                 MDLabel:
                     text: "Performance Settings"
                     font_style: "H6"
@@ -121,6 +267,28 @@ KV = '''
                     size_hint_y: None
                     height: dp(56)
                 
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Adaptive concurrency (workers = upper bound)"
+                    
+                    MDSwitch:
+                        id: adaptive
+                        pos_hint: {"center_y": .5}
+                
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Hedge slow requests (retry past p95 latency)"
+                    
+                    MDSwitch:
+                        id: hedge
+                        pos_hint: {"center_y": .5}
+                
                 MDTextField:
                     id: timeout
                     hint_text: "Request Timeout (seconds)"
@@ -131,127 +299,211 @@ KV = '''
                     size_hint_y: None
                     height: dp(56)
                 
-                Widget:
+                MDTextField:
+                    id: retries
+                    hint_text: "Retries per Request"
+                    text: "2"
+                    input_filter: "int"
+                    helper_text: "Retries with backoff on timeouts and server errors (0-5)"
+                    helper_text_mode: "on_focus"
                     size_hint_y: None
-                    height: dp(20)
+                    height: dp(56)
                 
-                MDRaisedButton:
-                    text: "Save Settings"
-                    size_hint_x: 1
+                MDTextField:
+                    id: run_budget
+                    hint_text: "Run Time Budget (minutes)"
+                    text: "10.0"
+                    input_filter: "float"
+                    helper_text: "Stop resolving and publish a partial playlist after this long (1-120)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDTextField:
+                    id: cache_ttl
+                    hint_text: "Stream Cache TTL (hours)"
+                    text: "6.0"
+                    input_filter: "float"
+                    helper_text: "Reuse resolved streams for this long (0 = always re-resolve)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDBoxLayout:
                     size_hint_y: None
                     height: dp(48)
-                    md_bg_color: app.theme_cls.primary_color
-                    on_release: root.save()
+                    
+                    MDLabel:
+                        text: "Async resolver engine"
+                    
+                    MDSwitch:
+                        id: async_engine
+                        pos_hint: {"center_y": .5}
+                
+                MDTextField:
+                    id: async_concurrency
+                    hint_text: "Async Concurrency"
+                    text: "100"
+                    input_filter: "int"
+                    helper_text: "In-flight requests with the async engine (10-500)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDTextField:
+                    id: parser
+                    hint_text: "HTML Parser"
+                    text: "auto"
+                    helper_text: "auto, lxml, selectolax, stream or bs4"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Stop player downloads at first stream URL"
+                    
+                    MDSwitch:
+                        id: stream_resolve
+                        pos_hint: {"center_y": .5}
+                
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Check streams and drop dead channels"
+                    
+                    MDSwitch:
+                        id: probe_streams
+                        pos_hint: {"center_y": .5}
                 
                 MDLabel:
-                    id: msg_label
-                    text: ""
+                    text: "Outputs"
+                    font_style: "H6"
                     size_hint_y: None
                     height: dp(40)
-                    halign: "center"
-
-<MainScreen>:
-    name: "main"
-    MDBoxLayout:
-        orientation: "vertical"
-        md_bg_color: app.theme_cls.bg_darkest
-        
-        MDTopAppBar:
-            title: "Local ISP TV Manager"
-            right_action_items: [["cog", lambda x: app.open_settings()]]
-            elevation: 2
-            size_hint_y: None
-            height: dp(56)
-        
-        MDBoxLayout:
-            orientation: "vertical"
-            padding: dp(20)
-            spacing: dp(15)
-            
-            MDCard:
-                orientation: "vertical"
-                padding: dp(15)
-                spacing: dp(10)
-                size_hint_y: None
-                height: dp(140)
-                elevation: 4
                 
-                MDLabel:
-                    text: "Status"
-                    font_style: "Subtitle1"
+                MDBoxLayout:
                     size_hint_y: None
-                    height: dp(30)
+                    height: dp(48)
                     
-                MDLabel:
-                    id: status
-                    text: "Ready to scrape"
-                    font_style: "Body1"
-                    theme_text_color: "Hint"
+                    MDLabel:
+                        text: "One playlist per category"
                     
-                MDLabel:
-                    id: timer
-                    text: "Next refresh: --:--:--"
-                    font_style: "Caption"
-                    theme_text_color: "Hint"
-            
-            MDCard:
-                orientation: "vertical"
-                padding: dp(15)
-                spacing: dp(12)
-                size_hint_y: None
-                height: dp(200)
-                elevation: 4
+                    MDSwitch:
+                        id: write_categories
+                        pos_hint: {"center_y": .5}
                 
-                MDRaisedButton:
-                    text: "Scrape & Upload Now"
-                    size_hint_x: 1
+                MDBoxLayout:
                     size_hint_y: None
                     height: dp(48)
-                    md_bg_color: app.theme_cls.primary_color
-                    on_release: root.run()
                     
-                MDRaisedButton:
-                    text: "Open in VLC"
-                    size_hint_x: 1
+                    MDLabel:
+                        text: "JSON channel index"
+                    
+                    MDSwitch:
+                        id: write_json
+                        pos_hint: {"center_y": .5}
+                
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Gzip copy of the playlist"
+                    
+                    MDSwitch:
+                        id: write_gzip
+                        pos_hint: {"center_y": .5}
+                
+                MDBoxLayout:
                     size_hint_y: None
                     height: dp(48)
-                    md_bg_color: (0.2, 0.6, 0.9, 1)
-                    on_release: root.vlc()
                     
+                    MDLabel:
+                        text: "Mirror channel logos"
+                    
+                    MDSwitch:
+                        id: mirror_logos
+                        pos_hint: {"center_y": .5}
+                
+                MDTextField:
+                    id: logo_size
+                    hint_text: "Logo Size (px)"
+                    text: "0"
+                    input_filter: "int"
+                    helper_text: "Shrink mirrored logos to PNG of this size, needs Pillow (0 = keep, 16-1024)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDTextField:
+                    id: logo_base_url
+                    hint_text: "Logo Base URL"
+                    helper_text: "Where players load mirrored logos (empty = GitHub with Git Data, else the LAN server)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: dp(48)
+                    
+                    MDLabel:
+                        text: "Serve playlists on the local network"
+                    
+                    MDSwitch:
+                        id: lan_server
+                        pos_hint: {"center_y": .5}
+                
+                MDTextField:
+                    id: lan_port
+                    hint_text: "LAN Server Port"
+                    text: "8090"
+                    input_filter: "int"
+                    helper_text: "TVs open http://<this device>:<port>/ (1024-65535)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                MDTextField:
+                    id: stream_max_kb
+                    hint_text: "Max Player Page Size (KB)"
+                    text: "256"
+                    input_filter: "int"
+                    helper_text: "Streaming mode gives up after this many KB (16-4096)"
+                    helper_text_mode: "on_focus"
+                    size_hint_y: None
+                    height: dp(56)
+                
+                Widget:
+                    size_hint_y: None
+                    height: dp(20)
+                
                 MDRaisedButton:
-                    id: pause_btn
-                    text: "Pause Auto-Refresh"
+                    text: "Save Settings"
                     size_hint_x: 1
                     size_hint_y: None
                     height: dp(48)
-                    md_bg_color: (0.9, 0.5, 0.2, 1)
-                    on_release: root.toggle_pause()
-            
-            Widget:
+                    md_bg_color: app.theme_cls.primary_color
+                    on_release: root.save()
+                
+                MDLabel:
+                    id: msg_label
+                    text: ""
+                    size_hint_y: None
+                    height: dp(40)
+                    halign: "center"
 '''
 
-# Configuration defaults
-BASE_URL = "http://redforce.live/"
-HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36", "Referer": BASE_URL}
-M3U_FILE = Path("/storage/emulated/0/Download/channels.m3u")
-REQUEST_TIMEOUT = 15
-
-class Config:
-    """Configuration manager"""
-    def __init__(self):
-        self.token = ""
-        self.repo = ""
-        self.path = "channels.m3u"
-        self.branch = "main"
-        self.interval = 2.0
-        self.workers = 15
-        self.timeout = 15
-        self.paused = False
-
-config = Config()
 
 class SettingsScreen(Screen):
     def save(self):
+        import channel_parser
         app = MDApp.get_running_app()
         
         # Validate inputs
@@ -259,11 +511,21 @@ class SettingsScreen(Screen):
         repo = self.ids.repo.text.strip()
         path = self.ids.path.text.strip()
         branch = self.ids.branch.text.strip()
+        parser = self.ids.parser.text.strip().lower() or "auto"
+        logo_base_url = self.ids.logo_base_url.text.strip()
+        provider_urls = [line.strip() for line in self.ids.providers.text.splitlines() if line.strip()]
         
         try:
             interval = float(self.ids.interval.text or 2.0)
             workers = int(self.ids.workers.text or 15)
             timeout = int(self.ids.timeout.text or 15)
+            retries = int(self.ids.retries.text or 2)
+            run_budget = float(self.ids.run_budget.text or 10.0)
+            cache_ttl = float(self.ids.cache_ttl.text or 6.0)
+            async_concurrency = int(self.ids.async_concurrency.text or 100)
+            stream_max_kb = int(self.ids.stream_max_kb.text or 256)
+            logo_size = int(self.ids.logo_size.text or 0)
+            lan_port = int(self.ids.lan_port.text or 8090)
         except ValueError:
             self.show_message("Invalid numeric values", error=True)
             return
@@ -284,6 +546,40 @@ class SettingsScreen(Screen):
             errors.append("Workers must be between 5 and 30")
         if timeout < 5 or timeout > 30:
             errors.append("Timeout must be between 5 and 30 seconds")
+        if retries < 0 or retries > 5:
+            errors.append("Retries must be between 0 and 5")
+        if run_budget < 1 or run_budget > 120:
+            errors.append("Run time budget must be between 1 and 120 minutes")
+        if cache_ttl < 0 or cache_ttl > 48:
+            errors.append("Cache TTL must be between 0 and 48 hours")
+        if async_concurrency < 10 or async_concurrency > 500:
+            errors.append("Async concurrency must be between 10 and 500")
+        if any(not url.startswith(("http://", "https://")) for url in provider_urls):
+            errors.append("Portal URLs must start with http:// or https://")
+        if parser != "auto" and parser not in channel_parser.PARSERS:
+            errors.append("Parser must be auto, lxml, selectolax, stream or bs4")
+        if stream_max_kb < 16 or stream_max_kb > 4096:
+            errors.append("Max player page size must be between 16 and 4096 KB")
+        if logo_size and (logo_size < 16 or logo_size > 1024):
+            errors.append("Logo size must be 0 or between 16 and 1024 px")
+        if logo_base_url and not logo_base_url.startswith(("http://", "https://")):
+            errors.append("Logo base URL must start with http:// or https://")
+        if lan_port < 1024 or lan_port > 65535:
+            errors.append("LAN server port must be between 1024 and 65535")
+        engine = "asyncio" if self.ids.async_engine.active else "threads"
+        stream_resolve = self.ids.stream_resolve.active
+        adaptive = self.ids.adaptive.active
+        hedge = self.ids.hedge.active
+        probe_streams = self.ids.probe_streams.active
+        publish_backend = "gitdata" if self.ids.gitdata.active else "contents"
+        write_categories = self.ids.write_categories.active
+        write_json = self.ids.write_json.active
+        write_gzip = self.ids.write_gzip.active
+        mirror_logos = self.ids.mirror_logos.active
+        lan_server = self.ids.lan_server.active
+        # Keep the headers and limits of portals set up in config.json
+        configured = {p["url"]: p for p in config.providers if isinstance(p, dict) and p.get("url")}
+        providers = [configured.get(url, url) for url in provider_urls]
         
         if errors:
             self.show_message("\n".join(f"• {e}" for e in errors), error=True)
@@ -297,8 +593,30 @@ class SettingsScreen(Screen):
         app.store.put('interval', value=interval)
         app.store.put('workers', value=workers)
         app.store.put('timeout', value=timeout)
+        app.store.put('retries', value=retries)
+        app.store.put('run_budget', value=run_budget)
+        app.store.put('cache_ttl', value=cache_ttl)
+        app.store.put('engine', value=engine)
+        app.store.put('async_concurrency', value=async_concurrency)
+        app.store.put('parser', value=parser)
+        app.store.put('stream_resolve', value=stream_resolve)
+        app.store.put('stream_max_kb', value=stream_max_kb)
+        app.store.put('adaptive', value=adaptive)
+        app.store.put('hedge_requests', value=hedge)
+        app.store.put('probe_streams', value=probe_streams)
+        app.store.put('publish_backend', value=publish_backend)
+        app.store.put('write_categories', value=write_categories)
+        app.store.put('write_json', value=write_json)
+        app.store.put('write_gzip', value=write_gzip)
+        app.store.put('mirror_logos', value=mirror_logos)
+        app.store.put('logo_size', value=logo_size)
+        app.store.put('logo_base_url', value=logo_base_url)
+        app.store.put('lan_server', value=lan_server)
+        app.store.put('lan_port', value=lan_port)
+        app.store.put('providers', value=providers)
         
         # Update config
+        lan_changed = (lan_server, lan_port) != (config.lan_server, config.lan_port)
         config.token = token
         config.repo = repo
         config.path = path
@@ -306,16 +624,41 @@ class SettingsScreen(Screen):
         config.interval = interval
         config.workers = workers
         config.timeout = timeout
+        config.retries = retries
+        config.run_budget = run_budget
+        config.cache_ttl = cache_ttl
+        config.engine = engine
+        config.async_concurrency = async_concurrency
+        config.parser = parser
+        config.stream_resolve = stream_resolve
+        config.stream_max_kb = stream_max_kb
+        config.adaptive = adaptive
+        config.hedge = hedge
+        config.probe_streams = probe_streams
+        config.publish_backend = publish_backend
+        config.write_categories = write_categories
+        config.write_json = write_json
+        config.write_gzip = write_gzip
+        config.mirror_logos = mirror_logos
+        config.logo_size = logo_size
+        config.logo_base_url = logo_base_url
+        config.lan_server = lan_server
+        config.lan_port = lan_port
+        config.providers = providers
         
         self.show_message("Settings saved successfully!", error=False)
         Clock.schedule_once(lambda dt: app.go_main(), 1.5)
         app.refresh_timer()
+        if lan_changed:
+            threading.Thread(target=app.start_lan_server, daemon=True).start()
 
     def validate_token(self, token):
         """Validate GitHub token"""
+        from github_publisher import GITHUB_API
+        from http_client import shared_client
         try:
-            r = requests.get(
-                "https://api.github.com/user",
+            r = shared_client(config.workers).get(
+                f"{GITHUB_API}/user",
                 headers={"Authorization": f"token {token}"},
                 timeout=10
             )
@@ -338,9 +681,13 @@ class MainScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.scraping = False
+        self.active_run = None
+        self.progress_event = None
+        self.cancel_token = None
+        self.auto_run = False
 
-    def run(self):
-        """Start scraping process"""
+    def run(self, kind="full", auto=False):
+        """Start scraping process; kind "incremental" only re-resolves expiring streams"""
         if self.scraping:
             self.show_dialog("Already Running", "Please wait for the current operation to complete.")
             return
@@ -349,51 +696,142 @@ class MainScreen(Screen):
             self.show_dialog("No Internet", "Please check your internet connection.")
             return
         
+        from resilience import CancelToken
         self.ids.status.text = "Initializing scraper..."
         self.scraping = True
+        self.auto_run = auto
+        self.cancel_token = CancelToken()
+        self.ids.cancel_btn.disabled = False
         self.acquire_wake_lock()
-        threading.Thread(target=self.worker, daemon=True).start()
+        # Poll the run's counters instead of a callback per channel
+        self.progress_event = Clock.schedule_interval(self.show_progress, PROGRESS_INTERVAL)
+        threading.Thread(target=self.worker, args=(kind, self.cancel_token), daemon=True).start()
+
+    def cancel(self):
+        """Stop the running refresh; the worker ends and releases the wake lock"""
+        if not self.scraping or self.cancel_token is None or self.cancel_token.cancelled():
+            return
+        self.show_status("Cancelling...")
+        self.cancel_token.cancel("Cancelled by user")
+
+    def show_progress(self, dt):
+        """Show the active run's phase, counts, request rate and ETA"""
+        from progress import format_progress
+        if self.active_run is None:
+            return
+        text = format_progress(self.active_run.progress.snapshot())
+        if self.ids.status.text != text:
+            self.ids.status.text = text
+
+    def show_status(self, text):
+        """Stop live progress and show text; safe to call from the worker thread"""
+        self.active_run = None
+        Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', text))
+
+    def stop_progress(self, dt=None):
+        self.active_run = None
+        self.ids.cancel_btn.disabled = True
+        if self.progress_event:
+            self.progress_event.cancel()
+            self.progress_event = None
 
-    def worker(self):
+    def worker(self, kind="full", cancel=None):
         """Background worker for scraping and uploading"""
+        run = None
+        result = "error"
         try:
+            # The scraping stack is imported on first use, not at app start
+            from metrics import start_run
+            from resilience import Cancelled
+            from scraper import refresh_streams, scrape_channels, upload_to_github
+            run = start_run()
+            self.active_run = run
+            upload = partial(upload_to_github, cancel)
+            
+            if kind == "incremental":
+                Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', "Refreshing expiring streams..."))
+                refreshed = refresh_streams(cancel)
+                if refreshed is not None:
+                    result = self.finish_incremental(*refreshed, upload)
+                    return
+            
             # Scraping phase
             Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', "Scraping channels..."))
-            total, successful = scrape_channels()
+            total, successful = scrape_channels(cancel)
+            skipped = run.counts.get("skipped", 0)
+            partial_note = f" (partial, {skipped} not resolved in time)" if skipped else ""
             
-            Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', 
-                f"Found {total} channels, resolved {successful} streams. Uploading..."))
+            self.show_status(f"Found {total} channels, resolved {successful} streams{partial_note}. Uploading...")
             
             # Upload phase
             if config.token and config.repo:
-                upload_success = upload_to_github()
+                upload_success = upload()
                 status = "✓ Success" if upload_success else "✗ Upload failed"
+                result = "ok" if upload_success else "upload_failed"
             else:
                 status = "✓ Saved locally (GitHub not configured)"
+                result = "local_only"
+            if skipped and result in ("ok", "local_only"):
+                result = "partial"
             
-            Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', 
-                f"{status}: {successful}/{total} channels"))
+            self.show_status(f"{status}: {successful}/{total} channels{partial_note}")
             
+        except Cancelled:
+            result = "cancelled"
+            self.show_status("✗ Refresh cancelled")
+            print("Worker cancelled")
         except Exception as e:
             error_msg = f"Error: {str(e)[:50]}"
-            Clock.schedule_once(lambda dt: setattr(self.ids.status, 'text', error_msg))
+            self.show_status(error_msg)
             print(f"Worker error: {e}")
         finally:
+            # Stop polling before the final status is shown
+            Clock.schedule_once(self.stop_progress)
+            if run:
+                self.save_metrics(run, result)
             self.scraping = False
             self.release_wake_lock()
+            # Serve what this run wrote (an unchanged playlist keeps its ETag)
+            MDApp.get_running_app().reload_lan_server()
+            # Plan the next refresh from the state this run left behind
+            Clock.schedule_once(lambda dt: MDApp.get_running_app().refresh_timer())
+
+    def finish_incremental(self, due, changed, upload):
+        """Upload after an incremental refresh, only if the playlist changed"""
+        if not changed:
+            status = f"✓ {due} expiring streams checked, playlist unchanged"
+            result = "unchanged"
+        elif config.token and config.repo:
+            upload_success = upload()
+            status = f"{'✓ Updated' if upload_success else '✗ Upload failed'}: {due} streams refreshed"
+            result = "ok" if upload_success else "upload_failed"
+        else:
+            status = f"✓ {due} streams refreshed, saved locally"
+            result = "local_only"
+        self.show_status(status)
+        return result
+
+    def save_metrics(self, run, result):
+        """Write the run's metrics report and show its summary on the status card"""
+        from scraper import METRICS_FILE
+        run.finish(result)
+        run.save(METRICS_FILE)
+        summary = run.summary()
+        print(f"Run metrics: {summary}")
+        Clock.schedule_once(lambda dt: setattr(self.ids.metrics, 'text', summary))
 
     def vlc(self):
         """Open M3U file in VLC"""
+        from scraper import M3U_FILE
         if not M3U_FILE.exists():
             self.show_dialog("No Playlist", "Please scrape channels first.")
             return
         
         if platform == 'android':
             try:
-                from jnius import autoclass
-                Intent = autoclass('android.content.Intent')
-                Uri = autoclass('android.net.Uri')
-                File = autoclass('java.io.File')
+                Intent = android_class('android.content.Intent')
+                Uri = android_class('android.net.Uri')
+                File = android_class('java.io.File')
                 
                 intent = Intent(Intent.ACTION_VIEW)
                 file_uri = Uri.fromFile(File(str(M3U_FILE)))
@@ -401,7 +839,7 @@ class MainScreen(Screen):
                 intent.setPackage("org.videolan.vlc")
                 intent.addFlags(Intent.FLAG_ACTIVITY_NEW_TASK)
                 
-                activity.startActivity(intent)
+                android_activity().startActivity(intent)
             except Exception as e:
                 self.show_dialog("Error", f"Could not open VLC: {str(e)[:50]}")
         else:
@@ -414,6 +852,9 @@ class MainScreen(Screen):
         app.store.put('paused', value=config.paused)
         
         if config.paused:
+            # A refresh the timer started stops too; one started by hand runs on
+            if self.auto_run:
+                self.cancel()
             self.ids.pause_btn.text = "Resume Auto-Refresh"
             self.ids.pause_btn.md_bg_color = (0.8, 0.3, 0.3, 1)
             self.ids.timer.text = "Auto-refresh paused"
@@ -427,7 +868,7 @@ class MainScreen(Screen):
         if platform != 'android':
             return True
         try:
-            cm = activity.getSystemService(ConnectivityManager)
+            cm = android_activity().getSystemService(android_class('android.net.ConnectivityManager'))
             network = cm.getActiveNetworkInfo()
             return network and network.isConnected()
         except:
@@ -437,7 +878,8 @@ class MainScreen(Screen):
         """Acquire wake lock to prevent sleep during scraping"""
         if platform == 'android' and not hasattr(self, 'wake_lock'):
             try:
-                pm = activity.getSystemService(PowerManager)
+                PowerManager = android_class('android.os.PowerManager')
+                pm = android_activity().getSystemService(PowerManager)
                 self.wake_lock = pm.newWakeLock(PowerManager.PARTIAL_WAKE_LOCK, "ISP:Scraper")
                 self.wake_lock.acquire()
             except Exception as e:
@@ -454,6 +896,7 @@ class MainScreen(Screen):
 
     def show_dialog(self, title, text=""):
         """Show dialog to user"""
+        from kivymd.uix.dialog import MDDialog
         MDDialog(
             title=title,
             text=text,
@@ -462,193 +905,6 @@ class MainScreen(Screen):
         ).open()
 
 
-def scrape_channels():
-    """Scrape channels from website"""
-    try:
-        session = requests.Session()
-        session.headers.update(HEADERS)
-        
-        # Fetch main page
-        response = session.get(BASE_URL, timeout=config.timeout)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Extract channel information
-        channels = []
-        for li in soup.select("ul#vidlink li"):
-            try:
-                anchor = li.find("a", {"onclick": True})
-                if not anchor:
-                    continue
-                
-                img = anchor.find("img")
-                if not img:
-                    continue
-                
-                name = img.get("alt", "").strip()
-                logo = urljoin(BASE_URL, img.get("src", ""))
-                
-                # Extract stream ID
-                onclick = anchor.get("onclick", "")
-                match = re.search(r"stream=(\d+)", onclick)
-                if not match:
-                    continue
-                stream_id = match.group(1)
-                
-                # Extract categories
-                categories = [c for c in li.get("class", []) if c != "All"]
-                category = categories[0] if categories else "Uncategorized"
-                
-                channels.append({
-                    "name": name,
-                    "id": stream_id,
-                    "logo": logo,
-                    "category": category
-                })
-            except Exception as e:
-                print(f"Error parsing channel: {e}")
-                continue
-        
-        if not channels:
-            print("No channels found")
-            return 0, 0
-        
-        # Resolve stream URLs concurrently
-        resolved_channels = []
-        with ThreadPoolExecutor(max_workers=config.workers) as executor:
-            future_to_channel = {
-                executor.submit(resolve_stream_url, ch["id"]): ch 
-                for ch in channels
-            }
-            
-            for future in as_completed(future_to_channel):
-                channel = future_to_channel[future]
-                try:
-                    stream_url = future.result()
-                    if stream_url:
-                        channel["url"] = stream_url
-                        resolved_channels.append(channel)
-                except Exception as e:
-                    print(f"Error resolving {channel['name']}: {e}")
-        
-        # Generate M3U playlist
-        if resolved_channels:
-            generate_m3u_playlist(resolved_channels)
-        
-        return len(channels), len(resolved_channels)
-    
-    except Exception as e:
-        print(f"Scraping error: {e}")
-        raise
-
-
-def resolve_stream_url(stream_id):
-    """Resolve stream URL from player page"""
-    try:
-        url = urljoin(BASE_URL, f"player.php?stream={stream_id}")
-        response = requests.get(url, headers=HEADERS, timeout=config.timeout)
-        response.raise_for_status()
-        
-        # Patterns to find m3u8 URL
-        patterns = [
-            r'<iframe[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']',
-            r'<source[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']',
-            r'file:\s*["\']([^"\']*\.m3u8[^"\']*)["\']',
-            r'source:\s*["\']([^"\']*\.m3u8[^"\']*)["\']',
-            r'(https?://[^\s\'"<>]*\.m3u8[^\s\'"<>]*)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, response.text, re.IGNORECASE)
-            if match:
-                m3u8_url = match.group(1).strip()
-                return urljoin(response.url, m3u8_url)
-        
-        # Check if redirected to m3u8
-        if ".m3u8" in response.url:
-            return response.url
-        
-        return None
-    except Exception as e:
-        print(f"Error resolving stream {stream_id}: {e}")
-        return None
-
-
-def generate_m3u_playlist(channels):
-    """Generate M3U playlist file"""
-    try:
-        M3U_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
-        lines = ["#EXTM3U"]
-        for ch in channels:
-            name = ch["name"].replace('"', "'")
-            logo = ch["logo"]
-            category = ch["category"]
-            url = ch["url"]
-            
-            lines.append(
-                f'#EXTINF:-1 tvg-name="{name}" tvg-logo="{logo}" group-title="{category}",{name}'
-            )
-            lines.append(url)
-        
-        M3U_FILE.write_text("\n".join(lines), encoding="utf-8")
-        print(f"Playlist saved: {M3U_FILE}")
-    except Exception as e:
-        print(f"Error generating playlist: {e}")
-        raise
-
-
-def upload_to_github():
-    """Upload M3U file to GitHub"""
-    try:
-        if not config.token or not config.repo:
-            print("GitHub not configured")
-            return False
-        
-        url = f"https://api.github.com/repos/{config.repo}/contents/{config.path}"
-        headers = {
-            "Authorization": f"token {config.token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Get existing file SHA (if exists)
-        sha = None
-        try:
-            response = requests.get(url, headers=headers, params={"ref": config.branch}, timeout=10)
-            if response.status_code == 200:
-                sha = response.json().get("sha")
-        except:
-            pass
-        
-        # Read and encode content
-        content = M3U_FILE.read_bytes()
-        encoded_content = base64.b64encode(content).decode('utf-8')
-        
-        # Prepare commit data
-        data = {
-            "message": f"Update playlist {time.strftime('%Y-%m-%d %H:%M:%S')}",
-            "content": encoded_content,
-            "branch": config.branch
-        }
-        
-        if sha:
-            data["sha"] = sha
-        
-        # Upload
-        response = requests.put(url, headers=headers, json=data, timeout=15)
-        
-        if response.status_code in [200, 201]:
-            print("Successfully uploaded to GitHub")
-            return True
-        else:
-            print(f"GitHub upload failed: {response.status_code} - {response.text}")
-            return False
-    
-    except Exception as e:
-        print(f"GitHub upload error: {e}")
-        return False
-
-
 class LocalISPTVApp(MDApp):
     def build(self):
         self.title = "Local ISP TV Manager"
@@ -658,12 +914,12 @@ class LocalISPTVApp(MDApp):
         # Load configuration
         self.store = JsonStore('config.json')
         self.load_config()
+        self.lan_server = None
         
         # Build UI
         Builder.load_string(KV)
         self.sm = ScreenManager()
         self.sm.add_widget(MainScreen())
-        self.sm.add_widget(SettingsScreen())
         
         # Set initial screen
         self.sm.current = "main"
@@ -675,21 +931,79 @@ class LocalISPTVApp(MDApp):
         # Start auto-refresh timer
         self.refresh_timer()
         
+        self.build_done = time.perf_counter()
+        Window.bind(on_flip=self.first_frame)
         return self.sm
 
+    def on_stop(self):
+        """Cancel a running refresh so its threads and the wake lock are let go"""
+        self.sm.get_screen("main").cancel()
+        self.stop_lan_server()
+
+    def first_frame(self, *args):
+        """Log startup timings once the first frame is on screen"""
+        Window.unbind(on_flip=self.first_frame)
+        timings = {
+            "version": __version__,
+            "platform": platform,
+            "imports": round(IMPORTS_DONE - APP_START, 3),
+            "build": round(self.build_done - APP_START, 3),
+            "first_frame": round(time.perf_counter() - APP_START, 3),
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        print(f"Startup: {timings}")
+        # Off the UI thread: it loads the scraping stack to find the files to serve
+        threading.Thread(target=self.start_lan_server, daemon=True).start()
+        try:
+            STARTUP_LOG.parent.mkdir(parents=True, exist_ok=True)
+            with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(timings) + "\n")
+        except OSError as e:
+            print(f"Startup log error: {e}")
+
+    def start_lan_server(self):
+        """(Re)start the LAN playlist server as configured; runs off the UI thread"""
+        self.stop_lan_server()
+        if not config.lan_server:
+            Clock.schedule_once(lambda dt: setattr(self.sm.get_screen("main").ids.lan, 'text', ""))
+            return
+        from playlist_server import PlaylistServer
+        try:
+            server = PlaylistServer(config.lan_port).start()
+        except OSError as e:
+            print(f"LAN server error: {e}")
+            text = f"LAN server error: {str(e)[:40]}"
+        else:
+            self.lan_server = server
+            self.reload_lan_server()
+            text = f"LAN: {server.url()}"
+        Clock.schedule_once(lambda dt: setattr(self.sm.get_screen("main").ids.lan, 'text', text))
+
+    def reload_lan_server(self):
+        """Swap in the files the last refresh wrote"""
+        server = self.lan_server
+        if server is None:
+            return
+        from scraper import load_playlist_server
+        try:
+            load_playlist_server(server)
+        except OSError as e:
+            print(f"LAN server reload error: {e}")
+
+    def stop_lan_server(self):
+        server, self.lan_server = self.lan_server, None
+        if server is not None:
+            server.stop()
+
     def load_config(self):
         """Load configuration from storage"""
-        config.token = self.store.get('github_token').get('value', '') if self.store.exists('github_token') else ''
-        config.repo = self.store.get('github_repo').get('value', '') if self.store.exists('github_repo') else ''
-        config.path = self.store.get('github_path').get('value', 'channels.m3u') if self.store.exists('github_path') else 'channels.m3u'
-        config.branch = self.store.get('github_branch').get('value', 'main') if self.store.exists('github_branch') else 'main'
-        config.interval = self.store.get('interval').get('value', 2.0) if self.store.exists('interval') else 2.0
-        config.workers = self.store.get('workers').get('value', 15) if self.store.exists('workers') else 15
-        config.timeout = self.store.get('timeout').get('value', 15) if self.store.exists('timeout') else 15
-        config.paused = self.store.get('paused').get('value', False) if self.store.exists('paused') else False
+        apply_settings({key: self.store.get(key).get('value') for key in SETTINGS if self.store.exists(key)})
 
     def open_settings(self):
         """Open settings screen"""
+        if not self.sm.has_screen("settings"):
+            Builder.load_string(SETTINGS_KV)
+            self.sm.add_widget(SettingsScreen())
         screen = self.sm.get_screen("settings")
         screen.ids.token.text = config.token
         screen.ids.repo.text = config.repo
@@ -698,6 +1012,29 @@ class LocalISPTVApp(MDApp):
         screen.ids.interval.text = str(config.interval)
         screen.ids.workers.text = str(config.workers)
         screen.ids.timeout.text = str(config.timeout)
+        screen.ids.retries.text = str(config.retries)
+        screen.ids.run_budget.text = str(config.run_budget)
+        screen.ids.cache_ttl.text = str(config.cache_ttl)
+        screen.ids.async_engine.active = config.engine == "asyncio"
+        screen.ids.async_concurrency.text = str(config.async_concurrency)
+        screen.ids.parser.text = config.parser
+        screen.ids.stream_resolve.active = config.stream_resolve
+        screen.ids.stream_max_kb.text = str(config.stream_max_kb)
+        screen.ids.adaptive.active = config.adaptive
+        screen.ids.hedge.active = config.hedge
+        screen.ids.probe_streams.active = config.probe_streams
+        screen.ids.gitdata.active = config.publish_backend == "gitdata"
+        screen.ids.write_categories.active = config.write_categories
+        screen.ids.write_json.active = config.write_json
+        screen.ids.write_gzip.active = config.write_gzip
+        screen.ids.mirror_logos.active = config.mirror_logos
+        screen.ids.logo_size.text = str(config.logo_size)
+        screen.ids.logo_base_url.text = config.logo_base_url
+        screen.ids.lan_server.active = config.lan_server
+        screen.ids.lan_port.text = str(config.lan_port)
+        screen.ids.providers.text = "\n".join(
+            p.get("url", "") if isinstance(p, dict) else p for p in config.providers
+        )
         self.sm.current = "settings"
 
     def go_main(self):
@@ -705,18 +1042,21 @@ class LocalISPTVApp(MDApp):
         self.sm.current = "main"
 
     def refresh_timer(self):
-        """Setup auto-refresh timer"""
+        """Schedule the next refresh: full every interval, incremental before streams expire"""
+        from scheduler import plan_refresh
         if hasattr(self, 'timer_event'):
             self.timer_event.cancel()
+        if hasattr(self, 'countdown_event'):
+            self.countdown_event.cancel()
         
         if config.paused:
             return
         
-        interval_seconds = config.interval * 3600
-        self.timer_event = Clock.schedule_once(self.auto_refresh, interval_seconds)
-        self.update_countdown(interval_seconds)
+        kind, delay = plan_refresh(config.interval)
+        self.timer_event = Clock.schedule_once(lambda dt: self.auto_refresh(kind), delay)
+        self.update_countdown(delay, kind)
 
-    def update_countdown(self, remaining):
+    def update_countdown(self, remaining, kind="full"):
         """Update countdown timer display"""
         if config.paused:
             return
@@ -729,16 +1069,19 @@ class LocalISPTVApp(MDApp):
         seconds = int(remaining % 60)
         
         main_screen = self.sm.get_screen("main")
-        main_screen.ids.timer.text = f"Next refresh: {hours:02d}:{minutes:02d}:{seconds:02d}"
+        label = "Next refresh" if kind == "full" else "Next stream refresh"
+        main_screen.ids.timer.text = f"{label}: {hours:02d}:{minutes:02d}:{seconds:02d}"
         
-        Clock.schedule_once(lambda dt: self.update_countdown(remaining - 1), 1)
+        self.countdown_event = Clock.schedule_once(lambda dt: self.update_countdown(remaining - 1, kind), 1)
 
-    def auto_refresh(self, dt):
+    def auto_refresh(self, kind="full"):
         """Perform automatic refresh"""
+        main_screen = self.sm.get_screen("main")
         if not config.paused:
-            main_screen = self.sm.get_screen("main")
-            main_screen.run()
-        self.refresh_timer()
+            main_screen.run(kind, auto=True)
+        # A started run plans the next refresh when it ends
+        if not main_screen.scraping:
+            self.refresh_timer()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,176 @@
+"""Per-run instrumentation: phase durations, request latencies, bytes, errors
+
+A refresh starts a RunMetrics with start_run(); pipeline code records into
+current_run(), which is always safe to call, even outside a run. At the end
+the run's report is appended to a JSON metrics file and summarized in one
+line for the status card.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from cache import JsonCache
+from progress import Progress
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Reports kept in the metrics file
+HISTORY = 20
+
+
+def error_kind(exc):
+    """Short label for a failed request: "HTTP 503" or the exception name"""
+    status = getattr(exc, "status", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return f"HTTP {status}" if status else type(exc).__name__
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RequestStats:
+    """Latency histogram, byte counts and errors for one kind of request"""
+    def __init__(self):
+        self.latencies = []
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.received = 0
+        self.sent = 0
+        self.retries = 0
+        self.errors = Counter()
+
+    def observe(self, seconds, received=0, sent=0):
+        self.latencies.append(seconds)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+        self.received += received
+        self.sent += sent
+
+    def report(self):
+        ordered = sorted(self.latencies)
+        ms = lambda value: round(value * 1000, 1) if value is not None else None
+        labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "count": len(ordered),
+            "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "max_ms": ms(ordered[-1]) if ordered else None,
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+            "bytes_received": self.received,
+            "bytes_sent": self.sent,
+            "retries": self.retries,
+            "errors": dict(self.errors)
+        }
+
+
+class RunMetrics:
+    """Everything measured during one refresh; safe to record from any thread"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.start = time.monotonic()
+        self.phases = {}
+        self.requests = {}
+        self.counts = {}
+        self.status = None
+        self.elapsed = None
+        # Live counters for the UI
+        self.progress = Progress()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a pipeline phase; repeated phases add up"""
+        start = time.monotonic()
+        self.progress.enter(name)
+        try:
+            yield
+        finally:
+            self.progress.leave(name)
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+    def stats(self, name):
+        if name not in self.requests:
+            self.requests[name] = RequestStats()
+        return self.requests[name]
+
+    def request(self, name, seconds, received=0, sent=0):
+        """Record one completed request"""
+        with self.lock:
+            self.stats(name).observe(seconds, received, sent)
+            self.progress.request()
+
+    def timing(self, name, seconds):
+        """Record a duration that is not a single request, e.g. a whole channel"""
+        with self.lock:
+            self.stats(name).observe(seconds)
+
+    def error(self, name, kind):
+        """Count a failed request (or failed match) by kind, e.g. an exception name"""
+        with self.lock:
+            self.stats(name).errors[kind] += 1
+
+    def retry(self, name):
+        """Count a failed attempt that is about to be retried"""
+        with self.lock:
+            self.stats(name).retries += 1
+
+    def count(self, **counts):
+        with self.lock:
+            self.counts.update(counts)
+
+    def finish(self, status):
+        self.status = status
+        self.elapsed = time.monotonic() - self.start
+
+    def report(self):
+        with self.lock:
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "status": self.status,
+                "total_s": round(self.elapsed if self.elapsed is not None else time.monotonic() - self.start, 3),
+                "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "counts": dict(self.counts),
+                "requests": {name: stats.report() for name, stats in self.requests.items()}
+            }
+
+    def summary(self):
+        """One line for the status card: phase times, resolve p95, errors, bytes"""
+        report = self.report()
+        parts = [" · ".join(f"{name} {seconds:.1f}s" for name, seconds in report["phases"].items())]
+        resolve = report["requests"].get("resolve")
+        if resolve and resolve["p95_ms"] is not None:
+            parts.append(f"p95 {resolve['p95_ms']:.0f}ms")
+        errors = sum(sum(r["errors"].values()) for r in report["requests"].values())
+        if errors:
+            parts.append(f"{errors} errors")
+        received = sum(r["bytes_received"] for r in report["requests"].values())
+        parts.append(f"{received / (1024 * 1024):.1f} MB")
+        return " | ".join(p for p in parts if p)
+
+    def save(self, path, history=HISTORY):
+        """Append this run's report to the metrics file, keeping the latest runs"""
+        store = JsonCache(path)
+        store.data["last"] = self.report()
+        store.data["runs"] = (store.data.get("runs", []) + [store.data["last"]])[-history:]
+        store.save()
+
+
+_current = RunMetrics()
+
+
+def start_run():
+    """Begin measuring a new refresh"""
+    global _current
+    _current = RunMetrics()
+    return _current
+
+
+def current_run():
+    return _current
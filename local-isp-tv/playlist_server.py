@@ -0,0 +1,254 @@
+"""Playlist server for the local network
+
+Serves the published files (the playlist, its per-category variants, the
+JSON index and mirrored logos) from memory, under the same paths they
+have in the GitHub repository; "/" is the main playlist. TVs on the LAN
+then read the playlist from this device instead of from GitHub.
+
+Each response carries a strong ETag and Last-Modified, so clients get a
+304 when nothing changed; playlists are sent gzip-compressed to clients
+that accept it, and single byte ranges are honoured. load() builds a new
+snapshot and swaps it in with one assignment, so a request always sees
+either the old set of files or the new one, never a mix. Kept free of
+Kivy imports; the app and the headless daemon both run it.
+"""
+import gzip
+import hashlib
+import socket
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import PurePosixPath
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_PORT = 8090
+# Smaller bodies are not worth compressing
+GZIP_MIN_BYTES = 1024
+CONTENT_TYPES = {
+    ".m3u": "audio/x-mpegurl",
+    ".json": "application/json",
+    ".gz": "application/gzip",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml"
+}
+COMPRESSIBLE = (".m3u", ".json", ".svg")
+# Logos are content-addressed: a file name never changes its bytes
+IMMUTABLE_PARENT = "logos"
+UNSATISFIABLE = "unsatisfiable"
+
+
+class Resource:
+    """One served file, with its gzip variant when that is smaller"""
+    __slots__ = ("body", "gzipped", "etag", "modified", "content_type", "cache_control")
+
+    def __init__(self, path, body, modified):
+        suffix = PurePosixPath(path).suffix.lower()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.body = body
+        self.etag = f'"{digest}"'
+        self.modified = int(modified)
+        self.content_type = CONTENT_TYPES.get(suffix, "application/octet-stream")
+        self.gzipped = None
+        if suffix in COMPRESSIBLE and len(body) >= GZIP_MIN_BYTES:
+            packed = gzip.compress(body, mtime=0)
+            if len(packed) < len(body):
+                self.gzipped = packed
+        if PurePosixPath(path).parent.name == IMMUTABLE_PARENT:
+            self.cache_control = "public, max-age=31536000, immutable"
+        else:
+            # Cache, but ask every time; an unchanged playlist costs a 304
+            self.cache_control = "no-cache"
+
+
+def build_snapshot(files, main=None, previous=None, now=None):
+    """{URL path: Resource}; unchanged files keep their ETag and Last-Modified"""
+    now = now or time.time()
+    previous = previous or {}
+    snapshot = {}
+    for path, body in files.items():
+        url_path = "/" + path.lstrip("/")
+        old = previous.get(url_path)
+        snapshot[url_path] = old if old is not None and old.body == body else Resource(path, body, now)
+    if main and "/" + main.lstrip("/") in snapshot:
+        snapshot["/"] = snapshot["/" + main.lstrip("/")]
+    return snapshot
+
+
+def accepts_gzip(header):
+    """Whether an Accept-Encoding header allows gzip"""
+    for token in (header or "").split(","):
+        name, _, params = token.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(header, etag):
+    """If-None-Match comparison; weak validators match their strong form"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def byte_range(header, length):
+    """(first, last) byte of a single "bytes=" range, None to ignore it, or UNSATISFIABLE"""
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return UNSATISFIABLE
+            return max(0, length - suffix), length - 1
+        start = int(first)
+        if start >= length:
+            return UNSATISFIABLE
+        end = int(last) if last else length - 1
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    return start, min(end, length - 1)
+
+
+def lan_address():
+    """This device's address on the local network, or 127.0.0.1"""
+    # Connecting a UDP socket sends nothing; it only picks the outgoing interface
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            probe.connect(("10.255.255.255", 1))
+            return probe.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LocalISPTV"
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        # One read of the snapshot: a concurrent load() cannot mix old and new files
+        resource = self.server.snapshot.get(unquote(urlsplit(self.path).path))
+        if resource is None:
+            return self.send_plain(404, b"Not Found", send_body)
+
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") not in (None, resource.etag):
+            range_header = None
+        # Ranges address the uncompressed bytes
+        use_gzip = resource.gzipped is not None and not range_header \
+            and accepts_gzip(self.headers.get("Accept-Encoding"))
+        body = resource.gzipped if use_gzip else resource.body
+        etag = f'"{resource.etag[1:-1]}-gzip"' if use_gzip else resource.etag
+
+        if self.not_modified(resource, etag):
+            self.send_response(304)
+            self.send_validators(resource, etag)
+            self.end_headers()
+            return
+
+        status, first, last = 200, 0, len(body) - 1
+        if range_header:
+            span = byte_range(range_header, len(body))
+            if span is UNSATISFIABLE:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if span:
+                status, (first, last) = 206, span
+
+        self.send_response(status)
+        self.send_validators(resource, etag)
+        self.send_header("Content-Type", resource.content_type)
+        self.send_header("Content-Length", str(last - first + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(body)}")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body[first:last + 1])
+
+    def not_modified(self, resource, etag):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        since = self.headers.get("If-Modified-Since")
+        if since:
+            try:
+                return resource.modified <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_validators(self, resource, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(resource.modified, usegmt=True))
+        self.send_header("Cache-Control", resource.cache_control)
+        if resource.gzipped is not None:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def send_plain(self, status, body, send_body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Players poll often; per-request lines would drown the pipeline log
+        pass
+
+
+class PlaylistServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        super().__init__((host, port), PlaylistHandler)
+        self.snapshot = {}
+        self.main = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="playlist-server", daemon=True)
+        self.thread.start()
+        print(f"Playlist server on {self.url()}")
+        return self
+
+    def load(self, files, main=None):
+        """Serve {repository path: bytes} from now on; main is also served as "/" """
+        self.main = main
+        self.snapshot = build_snapshot(files, main, self.snapshot)
+        print(f"Playlist server: {len(files)} files")
+
+    def url(self, path=None):
+        path = path if path is not None else self.main or ""
+        return f"http://{lan_address()}:{self.server_address[1]}/{path.lstrip('/')}"
+
+    def stop(self):
+        if self.thread:
+            self.shutdown()
+        self.server_close()
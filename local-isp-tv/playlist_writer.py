@@ -0,0 +1,127 @@
+"""Playlist output stage
+
+Makes one pass over the resolved channels, in a stable category/name order,
+and builds every output at once: the full M3U, optionally one M3U per
+category, a JSON channel index and a gzip copy of the full M3U. Each file is
+written to a temp file and renamed into place, so players and the uploader
+never see a half-written playlist.
+
+Output names derive from the main playlist path, locally and in the repo:
+
+    channels.m3u            full playlist
+    channels/<category>.m3u per-category playlists
+    channels.json           JSON index
+    channels.m3u.gz         gzip copy
+"""
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+
+M3U = "m3u"
+JSON = "json"
+GZIP = "gzip"
+# Category outputs are keyed by CATEGORY_PREFIX + slug of the category
+CATEGORY_PREFIX = "category/"
+
+
+def slugify(text):
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug or "uncategorized"
+
+
+def target_path(base, key):
+    """Path of an output relative to the main playlist path (Path or PurePosixPath)"""
+    if key == M3U:
+        return base
+    if key == JSON:
+        return base.with_suffix(".json")
+    if key == GZIP:
+        return base.with_name(base.name + ".gz")
+    if key.startswith(CATEGORY_PREFIX):
+        return base.parent / base.stem / f"{slugify(key[len(CATEGORY_PREFIX):])}.m3u"
+    raise ValueError(f"Unknown output {key}")
+
+
+def sort_key(channel):
+    return (channel["category"].lower(), channel["name"].lower(), channel["id"])
+
+
+def atomic_write(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class PlaylistWriter:
+    def __init__(self, base_path, categories=False, json_index=False, gzip_copy=False):
+        self.base_path = Path(base_path)
+        self.categories = categories
+        self.json_index = json_index
+        self.gzip_copy = gzip_copy
+
+    def render(self, channels):
+        """Build {output key: bytes} in a single pass over the channels"""
+        full = ["#EXTM3U"]
+        per_category = {}
+        index = []
+        for ch in sorted(channels, key=sort_key):
+            name = ch["name"].replace('"', "'")
+            category = ch["category"]
+            entry = (
+                f'#EXTINF:-1 tvg-name="{name}" tvg-logo="{ch["logo"]}" group-title="{category}",{name}',
+                ch["url"]
+            )
+            full.extend(entry)
+            if self.categories:
+                per_category.setdefault(slugify(category), ["#EXTM3U"]).extend(entry)
+            if self.json_index:
+                index.append({k: ch[k] for k in ("name", "id", "category", "logo", "url", "status", "latency") if k in ch})
+
+        outputs = {M3U: "\n".join(full).encode("utf-8")}
+        for slug, lines in per_category.items():
+            outputs[CATEGORY_PREFIX + slug] = "\n".join(lines).encode("utf-8")
+        if self.json_index:
+            outputs[JSON] = json.dumps(index, ensure_ascii=False, indent=1).encode("utf-8")
+        if self.gzip_copy:
+            # mtime=0 keeps the bytes identical when the playlist is unchanged
+            outputs[GZIP] = gzip.compress(outputs[M3U], mtime=0)
+        return outputs
+
+    def write(self, channels):
+        """Write all outputs atomically; returns {output key: Path}"""
+        outputs = self.render(channels)
+        written = {}
+        for key, data in outputs.items():
+            path = target_path(self.base_path, key)
+            atomic_write(path, data)
+            written[key] = path
+        if self.categories:
+            self.remove_stale_categories(set(written.values()))
+        return written
+
+    def remove_stale_categories(self, keep):
+        category_dir = target_path(self.base_path, CATEGORY_PREFIX + "x").parent
+        for path in category_dir.glob("*.m3u"):
+            if path not in keep:
+                path.unlink()
+
+
+def existing_outputs(base_path, categories=False, json_index=False, gzip_copy=False):
+    """Outputs of the last write that are on disk: {output key: Path}"""
+    base_path = Path(base_path)
+    candidates = {M3U: base_path}
+    if json_index:
+        candidates[JSON] = target_path(base_path, JSON)
+    if gzip_copy:
+        candidates[GZIP] = target_path(base_path, GZIP)
+    if categories:
+        for path in sorted(target_path(base_path, CATEGORY_PREFIX + "x").parent.glob("*.m3u")):
+            candidates[CATEGORY_PREFIX + path.stem] = path
+    return {key: path for key, path in candidates.items() if path.exists()}
@@ -0,0 +1,106 @@
+"""Stream liveness probing
+
+Fetches only the first bytes of each resolved HLS playlist, in parallel,
+and classifies the stream as alive, slow or dead with its latency.
+Healthy results are cached for a short TTL so back-to-back refreshes do
+not probe the same streams again.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import JsonCache
+from concurrency import WINDOW_PER_WORKER, completed_in_window
+from resilience import CancelToken
+
+ALIVE = "alive"
+SLOW = "slow"
+DEAD = "dead"
+
+PROBE_TIMEOUT = 5
+PROBE_MAX_BYTES = 4096
+SLOW_AFTER = 2.0
+PROBE_TTL = 600
+
+
+class ProbeCache(JsonCache):
+    """Recent healthy probe results keyed by stream URL"""
+    def __init__(self, path, ttl=PROBE_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        now = time.time()
+        self.data = {url: entry for url, entry in self.data.items()
+                     if entry.get("checked_at", 0) + self.ttl > now}
+
+    def get(self, url):
+        entry = self.data.get(url)
+        if entry and entry["checked_at"] + self.ttl > time.time():
+            return entry["status"], entry["latency"]
+        return None
+
+    def put(self, url, status, latency):
+        with self.lock:
+            if status == DEAD:
+                self.data.pop(url, None)
+            else:
+                self.data[url] = {"status": status, "latency": latency, "checked_at": time.time()}
+
+
+def probe_stream(client, url, headers, timeout=PROBE_TIMEOUT, max_bytes=PROBE_MAX_BYTES, slow_after=SLOW_AFTER):
+    """Return (status, latency) for one stream URL"""
+    start = time.monotonic()
+    try:
+        with client.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code >= 400:
+                return DEAD, round(time.monotonic() - start, 3)
+            head = b""
+            for chunk in response.iter_content(1024):
+                head += chunk
+                if len(head) >= max_bytes or b"#EXT" in head:
+                    break
+            latency = round(time.monotonic() - start, 3)
+        # Master and media playlists both start with #EXTM3U
+        if not head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"#EXTM3U"):
+            return DEAD, latency
+        return (SLOW if latency > slow_after else ALIVE), latency
+    except Exception as e:
+        print(f"Probe failed for {url}: {e}")
+        return DEAD, round(time.monotonic() - start, 3)
+
+
+def probe_channels(channels, client, headers_for, workers, cache=None, metrics=None, cancel=None):
+    """Probe every channel's URL; sets channel["status"] and ["latency"]
+
+    headers_for(channel) gives the request headers of the channel's
+    provider. Stops early, leaving the rest unprobed, when the CancelToken
+    is set.
+    """
+    workers = max(1, workers)
+    cancel = cancel or CancelToken()
+    to_probe = []
+    for ch in channels:
+        cached = cache.get(ch["url"]) if cache else None
+        if cached:
+            ch["status"], ch["latency"] = cached
+        else:
+            to_probe.append(ch)
+
+    probe = lambda ch: probe_stream(client, ch["url"], headers_for(ch))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for ch, future in completed_in_window(executor, probe, to_probe, workers * WINDOW_PER_WORKER, cancel):
+            ch["status"], ch["latency"] = future.result()
+            if metrics:
+                metrics.request("probe", ch["latency"])
+                if ch["status"] == DEAD:
+                    metrics.error("probe", DEAD)
+            if cache:
+                cache.put(ch["url"], ch["status"], ch["latency"])
+    finally:
+        executor.shutdown(wait=not cancel.cancelled(), cancel_futures=True)
+
+    counts = {ALIVE: 0, SLOW: 0, DEAD: 0}
+    for ch in channels:
+        if "status" in ch:
+            counts[ch["status"]] += 1
+    print(f"Stream probe: {counts} ({len(channels) - len(to_probe)} from cache)")
+    return counts
@@ -0,0 +1,93 @@
+"""Live progress of a refresh
+
+The pipeline bumps a few counters (channels queued, resolved, failed,
+requests, current phase); the UI reads a snapshot a few times a second.
+Events are merged simply by being counted, so the resolver never calls
+into the UI and a refresh of any size costs the UI the same few updates
+per second.
+"""
+import threading
+import time
+from collections import deque
+
+# Requests per second are measured over this many seconds of snapshots
+RATE_WINDOW = 3.0
+
+
+class Progress:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = []
+        self.total = 0
+        self.resolved = 0
+        self.failed = 0
+        self.requests = 0
+        self.started = None
+        self.samples = deque()
+
+    def enter(self, phase):
+        with self.lock:
+            self.phases.append(phase)
+
+    def leave(self, phase):
+        with self.lock:
+            if phase in self.phases:
+                self.phases.remove(phase)
+
+    def add_total(self, count):
+        """Channels queued for resolving"""
+        with self.lock:
+            self.total += count
+            if self.started is None:
+                self.started = time.monotonic()
+
+    def result(self, ok):
+        with self.lock:
+            if ok:
+                self.resolved += 1
+            else:
+                self.failed += 1
+
+    def pending(self):
+        """Channels queued but without a result, e.g. when the run ran out of time"""
+        with self.lock:
+            return self.total - self.resolved - self.failed
+
+    def request(self):
+        # Called with the run's metrics lock held; one increment, no lock of its own
+        self.requests += 1
+
+    def snapshot(self, now=None):
+        """{"phase", "resolved", "failed", "total", "rps", "eta"}; eta in seconds or None"""
+        now = now or time.monotonic()
+        with self.lock:
+            self.samples.append((now, self.requests))
+            while len(self.samples) > 2 and now - self.samples[0][0] > RATE_WINDOW:
+                self.samples.popleft()
+            (t0, r0), (t1, r1) = self.samples[0], self.samples[-1]
+            done = self.resolved + self.failed
+            elapsed = now - self.started if self.started else 0
+            eta = None
+            if done and elapsed and done < self.total:
+                eta = (self.total - done) * elapsed / done
+            return {
+                "phase": self.phases[-1] if self.phases else "",
+                "resolved": self.resolved,
+                "failed": self.failed,
+                "total": self.total,
+                "rps": (r1 - r0) / (t1 - t0) if t1 > t0 else 0.0,
+                "eta": eta
+            }
+
+
+def format_progress(snapshot):
+    """One status line, e.g. "Resolve: 312 ok, 5 failed of 1000 · 48 req/s · ETA 0:14" """
+    text = (snapshot["phase"] or "Working").capitalize()
+    if snapshot["total"]:
+        text += f": {snapshot['resolved']} ok, {snapshot['failed']} failed of {snapshot['total']}"
+    if snapshot["rps"]:
+        text += f" · {snapshot['rps']:.0f} req/s"
+    if snapshot["eta"] is not None:
+        minutes, seconds = divmod(int(snapshot["eta"]), 60)
+        text += f" · ETA {minutes}:{seconds:02d}"
+    return text
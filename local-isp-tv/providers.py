@@ -0,0 +1,156 @@
+"""Channel providers: the portals a playlist is built from
+
+A provider lists a portal's channels and says where each channel's player
+page is, with its own request headers and concurrency limit. Finding the
+stream URL in a player page is shared. redforce.live is the built-in
+provider; more portals come from config.providers, either as a base URL
+or as {"url", "name", "type", "headers", "concurrency"}.
+
+Cache entries are keyed "<provider name>:<stream ID>" so providers with
+overlapping stream IDs do not collide.
+"""
+import re
+import time
+import unicodedata
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import channel_parser
+from app_config import config
+from cache import IndexCache
+from http_client import is_overload_error
+from metrics import current_run, error_kind
+from stream_matcher import find_stream_url
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class Provider:
+    """One portal; subclasses implement list_channels() and player_url()"""
+    def __init__(self, name, base_url, headers=None, concurrency=None, cache_dir=Path("cache")):
+        self.name = name
+        self.base_url = base_url
+        self.headers = headers or {}
+        # None means the configured workers / async concurrency
+        self.concurrency = concurrency
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, stream_id):
+        """Cache key of a stream ID, namespaced by provider"""
+        return f"{self.name}:{stream_id}"
+
+    def list_channels(self, client, guard):
+        """Channel records with "name", "id", "logo" and "category", in portal order"""
+        raise NotImplementedError
+
+    def player_url(self, stream_id):
+        raise NotImplementedError
+
+    def extract_stream(self, html, page_url):
+        """Stream URL in a player page, or None"""
+        return find_stream_url(html, page_url)
+
+
+class RedforceProvider(Provider):
+    """redforce.live and portals running the same player.php software"""
+    def list_channels(self, client, guard):
+        """Fetch and parse the channel index, reusing the last parse when unchanged"""
+        run = current_run()
+        # Fetch main page, conditionally if we have validators from last time
+        index = IndexCache(self.cache_dir / f"index-{self.name}.json")
+
+        def attempt(timeout):
+            start = time.monotonic()
+            response = client.get(
+                self.base_url,
+                headers={**self.headers, **index.conditional_headers(self.base_url)},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            run.request("index", time.monotonic() - start, received=response.raw.tell())
+            return response
+
+        try:
+            response = guard.call(self.base_url, attempt, is_overload_error, config.timeout, name="index")
+        except Exception as e:
+            run.error("index", error_kind(e))
+            raise
+
+        if response.status_code == 304:
+            print(f"{self.name}: channel index not modified (304), reusing parsed channels")
+            return index.channels_for(self.base_url)
+
+        channels = index.channels_for(self.base_url, response.content)
+        if channels is not None:
+            print(f"{self.name}: channel index unchanged (same hash), reusing parsed channels")
+            index.refresh_validators(response.headers)
+        else:
+            channels = channel_parser.parse_channels(response.text, self.base_url, config.parser)
+            if channels:
+                index.update(self.base_url, response.headers, response.content, channels)
+        index.save()
+        return channels
+
+    def player_url(self, stream_id):
+        return urljoin(self.base_url, f"player.php?stream={stream_id}")
+
+
+PROVIDER_TYPES = {
+    "redforce": RedforceProvider
+}
+
+
+def make_provider(entry, default_headers, cache_dir):
+    """Provider for a config.providers entry; raises ValueError if invalid"""
+    if isinstance(entry, str):
+        entry = {"url": entry}
+    url = (entry.get("url") or "").strip()
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"Provider URL must start with http:// or https://: {url!r}")
+    if not url.endswith("/"):
+        url += "/"
+    kind = entry.get("type", "redforce")
+    if kind not in PROVIDER_TYPES:
+        raise ValueError(f"Unknown provider type: {kind!r}")
+    name = entry.get("name") or urlsplit(url).netloc
+    headers = {**default_headers, "Referer": url, **entry.get("headers", {})}
+    return PROVIDER_TYPES[kind](name, url, headers, entry.get("concurrency"), cache_dir)
+
+
+def normalize_name(name):
+    """Channel name for duplicate detection: case, spacing and punctuation ignored"""
+    return re.sub(r"[\W_]+", "", unicodedata.normalize("NFKC", name).casefold())
+
+
+def normalize_url(url):
+    """Stream URL for duplicate detection: without query, fragment or default port"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = f":{parts.port}" if parts.port and parts.port != DEFAULT_PORTS.get(scheme) else ""
+    return f"{scheme}://{(parts.hostname or '').lower()}{port}{parts.path}"
+
+
+def merge_channels(groups):
+    """Concatenate per-provider channel lists, earlier providers first
+
+    A channel is dropped when an earlier provider already has one with the
+    same normalized name or stream URL. Duplicates within one provider are
+    kept, as before. Returns (channels, number dropped).
+    """
+    seen = set()
+    merged = []
+    dropped = 0
+    for channels in groups:
+        added = set()
+        for ch in channels:
+            keys = {("url", normalize_url(ch["url"]))}
+            name = normalize_name(ch["name"])
+            if name:
+                keys.add(("name", name))
+            if keys & seen:
+                dropped += 1
+                continue
+            added |= keys
+            merged.append(ch)
+        seen |= added
+    return merged, dropped
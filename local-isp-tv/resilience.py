@@ -0,0 +1,262 @@
+"""Retries, per-host circuit breakers, a run deadline and cancellation
+
+A Guard wraps each request attempt:
+- retryable failures (timeouts, dropped connections, 429, 5xx) are retried
+  with capped exponential backoff and full jitter
+- each host has a circuit breaker; after repeated failures it opens and
+  requests to that host fail fast until a trial request succeeds
+- every attempt's timeout and every backoff sleep is clamped to the run
+  deadline, and nothing starts once it has passed
+
+so a run takes at most about its time budget, however many channels fail.
+A CancelToken stops a run on request: no attempt starts once it is set,
+backoff sleeps wake up, and the engines stop submitting channels.
+"""
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+# Do not start an attempt with less time than this left
+MIN_ATTEMPT_TIME = 0.5
+
+
+class ResilienceError(Exception):
+    pass
+
+
+class CircuitOpenError(ResilienceError):
+    pass
+
+
+class DeadlineExceeded(ResilienceError):
+    pass
+
+
+class Cancelled(ResilienceError):
+    pass
+
+
+class CancelToken:
+    """Set once, from any thread, to stop a run
+
+    Pipeline code checks it between steps and sleeps on it; work blocked
+    elsewhere (an executor, an event loop) registers a callback to stop.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.reason = "Cancelled"
+
+    def cancel(self, reason=None):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason or self.reason
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback error: {e}")
+
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled(self.reason)
+
+    def sleep(self, seconds):
+        """time.sleep() that raises Cancelled as soon as the token is set"""
+        if self.event.wait(seconds):
+            raise Cancelled(self.reason)
+
+    def on_cancel(self, callback):
+        """Call callback() on cancel, right away if already cancelled; returns an unregister function"""
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return lambda: self.remove(callback)
+        callback()
+        return lambda: None
+
+    def remove(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+
+class Deadline:
+    """Absolute end of a run; None seconds means no deadline"""
+    def __init__(self, seconds=None):
+        self.end = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        if self.end is None:
+            return float("inf")
+        return max(0.0, self.end - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def clamp(self, timeout):
+        """A request timeout that does not outlive the deadline"""
+        return min(timeout, self.remaining())
+
+
+class RetryPolicy:
+    def __init__(self, retries=MAX_RETRIES, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+    def backoff(self, retry):
+        """Full-jitter delay before retry number `retry` (0-based)"""
+        return random.uniform(0, min(self.cap, self.base * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open
+    after `reset_timeout`, when one trial request decides which way it goes"""
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class Guard:
+    """Retry policy, per-host breakers, a deadline and a cancel token applied to requests"""
+    def __init__(self, policy=None, deadline=None, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 metrics=None, cancel=None):
+        self.policy = policy or RetryPolicy()
+        self.deadline = deadline or Deadline()
+        self.cancel = cancel or CancelToken()
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def breaker(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def open_hosts(self):
+        with self.lock:
+            return [host for host, breaker in self.breakers.items() if breaker.state != "closed"]
+
+    def stopped(self):
+        """Whether no more work should start: cancelled or out of time"""
+        return self.cancel.cancelled() or self.deadline.remaining() < MIN_ATTEMPT_TIME
+
+    def check(self, url=""):
+        """Raise Cancelled or DeadlineExceeded if no more work should start"""
+        self.cancel.check()
+        if self.deadline.remaining() < MIN_ATTEMPT_TIME:
+            raise DeadlineExceeded(f"Run deadline reached before {url or 'the next step'}")
+
+    def before_attempt(self, breaker, url):
+        self.check(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+
+    def after_failure(self, breaker, exc, retryable, retry, name):
+        """Record a failed attempt; return the backoff delay, or None to give up"""
+        if not retryable(exc):
+            # The host answered; only server-side trouble counts against it
+            breaker.record_success()
+            return None
+        breaker.record_failure()
+        if retry >= self.policy.retries:
+            return None
+        delay = self.policy.backoff(retry)
+        if delay + MIN_ATTEMPT_TIME > self.deadline.remaining():
+            return None
+        if self.metrics:
+            self.metrics.retry(name)
+        return delay
+
+    def call(self, url, attempt, retryable, timeout, name="resolve"):
+        """Run attempt(timeout) with retries; re-raises the last failure
+
+        `name` labels the retries in the run metrics.
+        """
+        breaker = self.breaker(url)
+        retry = 0
+        while True:
+            self.before_attempt(breaker, url)
+            try:
+                result = attempt(self.deadline.clamp(timeout))
+            except Exception as e:
+                delay = self.after_failure(breaker, e, retryable, retry, name)
+                if delay is None:
+                    raise
+                self.cancel.sleep(delay)
+                retry += 1
+                continue
+            breaker.record_success()
+            return result
+
+    async def acall(self, url, attempt, retryable, timeout, name="resolve"):
+        """Async counterpart of call(); attempt(timeout) returns an awaitable"""
+        breaker = self.breaker(url)
+        retry = 0
+        while True:
+            self.before_attempt(breaker, url)
+            try:
+                result = await attempt(self.deadline.clamp(timeout))
+            except Exception as e:
+                delay = self.after_failure(breaker, e, retryable, retry, name)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retry += 1
+                continue
+            breaker.record_success()
+            return result
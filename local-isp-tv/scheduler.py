@@ -0,0 +1,103 @@
+"""Refresh planning from stream expiry times
+
+A full refresh re-lists every provider and resolves what the stream cache
+cannot serve. Between full refreshes, an incremental refresh re-resolves
+only the published channels whose stream URLs are about to expire; they
+expire at their signed-URL expiry or learned lifetime (see StreamCache).
+The published channels and the time of the last full refresh persist in
+cache/schedule.json, so the plan survives an app restart. Kept free of
+the scraping stack so the app can plan its timer at startup.
+"""
+import time
+from pathlib import Path
+
+from cache import JsonCache
+from channel import Channel
+
+CACHE_DIR = Path("cache")
+SCHEDULE_FILE = CACHE_DIR / "schedule.json"
+STREAMS_FILE = CACHE_DIR / "streams.json"
+# Start an incremental refresh this long before the first stream expires
+LEAD_TIME = 300
+# ...and take along every stream expiring within this window after that
+BATCH_WINDOW = 900
+# Streams must stay valid this long to be reused by any refresh
+REFRESH_HORIZON = LEAD_TIME + BATCH_WINDOW
+# Never plan two refreshes closer together than this
+MIN_DELAY = 60
+# An incremental refresh that takes along every published stream is a full
+# re-resolve; never start one sooner than this after the last refresh
+WHOLE_PLAYLIST_GAP = 30 * 60
+# Channel fields kept for rewriting the playlist without a full refresh
+PUBLISHED_FIELDS = ("key", "provider", "id", "name", "logo", "category", "url", "status", "latency")
+
+
+class RefreshState(JsonCache):
+    """Channels in the current playlist and when the last full refresh ran"""
+    def channels(self):
+        with self.lock:
+            return [Channel.from_dict(ch) for ch in self.data.get("channels", [])]
+
+    def same(self, channels):
+        """Whether the playlist would come out the same as the published one"""
+        return self.signature(self.channels()) == self.signature(channels)
+
+    @staticmethod
+    def signature(channels):
+        return sorted(tuple(str(ch.get(k, "")) for k in PUBLISHED_FIELDS) for ch in channels)
+
+    def publish(self, channels, full, now=None):
+        now = now or time.time()
+        with self.lock:
+            self.data["channels"] = [{k: ch[k] for k in PUBLISHED_FIELDS if k in ch} for ch in channels]
+            self.data["last_full" if full else "last_incremental"] = now
+
+
+def known_expiries(state, streams):
+    """Signed or learned expiry times of the published channels' streams
+
+    Expiries that only come from the cache TTL are left out: those streams
+    are not known to stop working, and with a TTL of 0 every stream
+    "expires" the moment it is resolved.
+    """
+    entries = streams.data
+    expiries = []
+    for ch in state.channels():
+        entry = entries.get(ch.get("key"), {})
+        if entry.get("expiry_known"):
+            expiries.append(entry["expires_at"])
+    return expiries
+
+
+def next_expiry(state, streams):
+    """Earliest known expiry among the published channels' streams, or None"""
+    expiries = known_expiries(state, streams)
+    return min(expiries) if expiries else None
+
+
+def plan_refresh(interval, now=None, state_path=SCHEDULE_FILE, streams_path=STREAMS_FILE):
+    """("full" or "incremental", seconds until it is due)
+
+    A full refresh is due `interval` hours after the last one; an
+    incremental one when a published stream is about to expire before that,
+    by its signed URL or learned lifetime. A stream expiring shortly before
+    the full refresh brings that forward. A refresh that would re-resolve
+    every published stream waits WHOLE_PLAYLIST_GAP after the last one.
+    """
+    now = now or time.time()
+    state = RefreshState(state_path)
+    last_full = state.data.get("last_full")
+    full_at = (last_full or now) + interval * 3600
+    if full_at <= now:
+        return "full", MIN_DELAY
+    expiries = known_expiries(state, JsonCache(streams_path))
+    if not expiries:
+        return "full", max(MIN_DELAY, full_at - now)
+    due = min(expiries) - LEAD_TIME
+    batch = sum(1 for expiry in expiries if expiry - LEAD_TIME <= due + BATCH_WINDOW)
+    if batch >= len(state.channels()):
+        last = max(last_full or 0, state.data.get("last_incremental") or 0)
+        due = max(due, last + WHOLE_PLAYLIST_GAP)
+    if due < full_at - BATCH_WINDOW:
+        return "incremental", max(MIN_DELAY, due - now)
+    return "full", max(MIN_DELAY, min(full_at, due) - now)
@@ -0,0 +1,649 @@
+"""Scraping pipeline without any GUI dependency
+
+scrape -> resolve -> generate -> upload, driven by app_config.config.
+The Kivy app and the headless runner both import from here.
+"""
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path, PurePosixPath
+
+import async_engine
+from app_config import config
+from cache import JsonCache, LatencyHistory, StreamCache, git_blob_sha
+from concurrency import WINDOW_PER_WORKER, AdaptiveLimiter, completed_in_window, load_controller, save_controller
+from github_publisher import GITHUB_API, GitDataPublisher, PublishError
+from hedging import HEDGE_PERCENTILE, Hedger
+from http_client import is_overload_error, shared_client
+from logo_cache import LogoCache, mirror_logos, rewrite_logos
+from metrics import current_run, error_kind, percentile
+from playlist_server import lan_address
+from playlist_writer import PlaylistWriter, existing_outputs, target_path
+from probe import DEAD, ProbeCache, probe_channels
+from providers import RedforceProvider, make_provider, merge_channels
+from resilience import Cancelled, CancelToken, Deadline, DeadlineExceeded, Guard, RetryPolicy
+from scheduler import REFRESH_HORIZON, SCHEDULE_FILE, STREAMS_FILE, RefreshState
+from stream_matcher import find_stream_url_streaming
+
+# Configuration defaults
+BASE_URL = "http://redforce.live/"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36", "Referer": BASE_URL}
+M3U_FILE = Path("/storage/emulated/0/Download/channels.m3u")
+REQUEST_TIMEOUT = 15
+CACHE_DIR = Path("cache")
+CONCURRENCY_FILE = CACHE_DIR / "concurrency.json"
+METRICS_FILE = CACHE_DIR / "metrics.json"
+LATENCY_FILE = CACHE_DIR / "latency.json"
+LOGO_FILE = CACHE_DIR / "logos.json"
+LOGO_DIR = CACHE_DIR / "logos"
+# Folder next to the playlist in the repository that published logos go to
+LOGO_FOLDER = "logos"
+
+
+def scrape_channels(cancel=None):
+    """Scrape every provider concurrently and merge their channels
+
+    When the run's time budget runs out, the channels resolved so far are
+    published as a partial playlist. Setting the CancelToken stops the run
+    and raises Cancelled; streams resolved until then stay cached.
+    """
+    try:
+        client = shared_client(config.workers)
+        run = current_run()
+        cancel = cancel or CancelToken()
+        # Retries, per-host circuit breakers, the run's time budget and cancellation
+        guard = Guard(RetryPolicy(config.retries), Deadline(config.run_budget * 60), metrics=run, cancel=cancel)
+        providers = build_providers()
+        headers_for = provider_headers(providers)
+        
+        # Reuse cached stream URLs that stay valid until the next refresh; keys are per provider
+        cache = StreamCache(STREAMS_FILE, ttl=config.cache_ttl * 3600)
+        history = LatencyHistory(LATENCY_FILE)
+        
+        results, errors = scrape_concurrently([(p, None) for p in providers], client, guard, cache, history)
+        if cancel.cancelled():
+            save_resolve_state(cache, history)
+            cancel.check()
+        if len(errors) == len(providers):
+            raise errors[0]
+        
+        channels = [ch for listed, _, _, _, _ in results for ch in listed]
+        if not channels:
+            print("No channels found")
+            return 0, 0
+        if not errors:
+            # Only forget entries when every provider listed its channels
+            cache.prune(ch["key"] for ch in channels)
+            history.prune(ch["key"] for ch in channels)
+        
+        resolved_channels, duplicates = merge_channels([resolved for _, resolved, _, _, _ in results])
+        if len(providers) > 1:
+            print(f"Merged {len(providers)} providers: {len(resolved_channels)} channels, "
+                  f"{duplicates} duplicates dropped")
+        hedgers = [hedger for _, _, _, _, hedger in results if hedger]
+        if hedgers:
+            run.count(hedges=sum(h.hedges for h in hedgers), hedge_wins=sum(h.wins for h in hedgers))
+        if guard.open_hosts():
+            print(f"Circuit open for: {', '.join(guard.open_hosts())}")
+        # Not resolved and no cached stream to fall back on
+        skipped = sum(n for _, _, _, n, _ in results)
+        if skipped:
+            print(f"Run time budget used up: {skipped} channels not resolved, publishing a partial playlist")
+        
+        # Drop streams that do not serve a playlist
+        if config.probe_streams and resolved_channels and guard.deadline.expired():
+            print("Run time budget used up, skipping stream probe")
+        elif config.probe_streams and resolved_channels:
+            probe_cache = ProbeCache(CACHE_DIR / "probes.json")
+            try:
+                with run.phase("probe"):
+                    probe_channels(resolved_channels, client, headers_for, config.workers, probe_cache, metrics=run,
+                                   cancel=cancel)
+            finally:
+                probe_cache.save()
+            if cancel.cancelled():
+                save_resolve_state(cache, history)
+                cancel.check()
+            for ch in resolved_channels:
+                if ch["status"] == DEAD:
+                    cache.discard(ch["key"])
+            resolved_channels = [ch for ch in resolved_channels if ch["status"] != DEAD]
+        
+        if config.mirror_logos and resolved_channels:
+            mirror_channel_logos(channels, resolved_channels, client, guard, headers_for, prune=not errors)
+            if cancel.cancelled():
+                save_resolve_state(cache, history)
+                cancel.check()
+        
+        save_resolve_state(cache, history)
+        print(f"HTTP pool: {client.stats()}")
+        pending = sum(n for _, _, n, _, _ in results)
+        run.count(channels=len(channels), cached=len(channels) - pending, resolved=len(resolved_channels),
+                  duplicates=duplicates, skipped=skipped)
+        
+        # Generate M3U playlist, unless it would come out the same
+        if resolved_channels:
+            state = RefreshState(SCHEDULE_FILE)
+            if state.same(resolved_channels) and M3U_FILE.exists():
+                print("Playlist unchanged, not rewriting it")
+            else:
+                generate_m3u_playlist(resolved_channels)
+            state.publish(resolved_channels, full=True)
+            state.save()
+        
+        return len(channels), len(resolved_channels)
+    
+    except Cancelled:
+        print("Scraping cancelled")
+        raise
+    except Exception as e:
+        print(f"Scraping error: {e}")
+        raise
+
+
+def mirror_channel_logos(channels, resolved_channels, client, guard, headers_for, prune):
+    """Mirror the logos of the playlist's channels and point tvg-logo at the copies
+
+    With the run's time budget used up, only logos already mirrored are used.
+    """
+    base_url = logo_base_url()
+    if base_url is None:
+        print("No published or served logo location, keeping the portal's logo URLs")
+        return
+    logos = LogoCache(LOGO_FILE, LOGO_DIR)
+    if prune:
+        # Before rewriting: channels share their records with resolved_channels
+        logos.prune(ch["logo"] for ch in channels)
+    try:
+        if guard.deadline.expired():
+            print("Run time budget used up, using only logos mirrored before")
+            rewrite_logos(resolved_channels, logos, base_url)
+            return
+        with current_run().phase("logos"):
+            counts = mirror_logos(resolved_channels, client, headers_for, config.workers, logos, base_url,
+                                  size=config.logo_size, metrics=current_run(), cancel=guard.cancel)
+        current_run().count(logos_downloaded=counts["downloaded"], logos_failed=counts["failed"])
+    finally:
+        logos.save()
+
+
+def logo_base_url():
+    """URL prefix other devices can load mirrored logos from, or None
+
+    config.logo_base_url wins. With the Git Data backend, logos are
+    published next to the playlist and served from raw.githubusercontent.com;
+    otherwise the LAN playlist server serves them, when it is on. The local
+    copies alone are no use to a playlist read on another device.
+    """
+    folder = PurePosixPath(config.path).parent / LOGO_FOLDER
+    if config.logo_base_url:
+        return config.logo_base_url.rstrip("/") + "/"
+    if config.repo and config.publish_backend == "gitdata":
+        return f"https://raw.githubusercontent.com/{config.repo}/{config.branch}/{folder}/"
+    if config.lan_server:
+        return f"http://{lan_address()}:{config.lan_port}/{folder}/"
+    return None
+
+
+def save_resolve_state(cache, history):
+    """Persist what this run resolved and how long it took"""
+    cache.save()
+    history.save()
+
+
+def refresh_streams(cancel=None):
+    """Re-resolve only the published channels whose streams are about to expire
+
+    Returns (channels re-resolved, whether the playlist changed), or None
+    when there is no published playlist to refresh yet. The playlist is
+    rewritten only when a stream URL changed or a channel dropped out.
+    Cancelling raises Cancelled and leaves the playlist as it was.
+    """
+    run = current_run()
+    cancel = cancel or CancelToken()
+    state = RefreshState(SCHEDULE_FILE)
+    published = state.channels()
+    if not published or not M3U_FILE.exists():
+        print("No published playlist yet, a full refresh is needed")
+        return None
+
+    client = shared_client(config.workers)
+    guard = Guard(RetryPolicy(config.retries), Deadline(config.run_budget * 60), metrics=run, cancel=cancel)
+    cache = StreamCache(STREAMS_FILE, ttl=config.cache_ttl * 3600)
+    history = LatencyHistory(LATENCY_FILE)
+    valid_until = time.time() + REFRESH_HORIZON
+    due = [ch for ch in published if not cache.get(ch["key"], now=valid_until)]
+    print(f"Incremental refresh: {len(due)} of {len(published)} streams expiring soon")
+
+    providers = {p.name: p for p in build_providers()}
+    jobs = {}
+    for ch in due:
+        if ch.get("provider") in providers:
+            jobs.setdefault(ch["provider"], []).append(ch)
+    if jobs:
+        results, _ = scrape_concurrently([(providers[name], chs) for name, chs in jobs.items()],
+                                         client, guard, cache, history)
+    else:
+        results = []
+    if cancel.cancelled():
+        save_resolve_state(cache, history)
+        cancel.check()
+
+    # Channels that failed to re-resolve or whose provider is gone drop out;
+    # scrape_provider() keeps the cached stream of those it had no time for
+    refreshed = {ch["key"]: ch for _, resolved, _, _, _ in results for ch in resolved}
+    due_keys = {ch["key"] for ch in due}
+    channels = [refreshed.get(ch["key"], ch) for ch in published
+                if ch["key"] not in due_keys or ch["key"] in refreshed]
+    changed = not state.same(channels)
+    if changed:
+        generate_m3u_playlist(channels)
+    else:
+        print("Playlist unchanged, not rewriting it")
+    state.publish(channels, full=False)
+    state.save()
+    save_resolve_state(cache, history)
+    run.count(channels=len(published), due=len(due), refreshed=len(refreshed), resolved=len(channels),
+              changed=changed, skipped=sum(n for _, _, _, n, _ in results))
+    return len(due), changed
+
+
+def build_providers():
+    """The built-in redforce.live provider followed by config.providers"""
+    providers = [RedforceProvider("redforce", BASE_URL, HEADERS, cache_dir=CACHE_DIR)]
+    for entry in config.providers:
+        try:
+            provider = make_provider(entry, HEADERS, CACHE_DIR)
+        except ValueError as e:
+            print(f"Skipping provider: {e}")
+            continue
+        if provider.name in {p.name for p in providers}:
+            provider.name = f"{provider.name}-{len(providers)}"
+        providers.append(provider)
+    return providers
+
+
+def provider_headers(providers):
+    """headers_for(channel): request headers of the provider the channel came from"""
+    by_name = {p.name: p.headers for p in providers}
+    return lambda ch: by_name.get(ch.get("provider"), HEADERS)
+
+
+def scrape_concurrently(jobs, client, guard, cache, history):
+    """scrape_provider() for each (provider, channels) job, one thread per provider
+
+    One thread each, so a slow portal does not hold up the others. Returns
+    (results of the providers that succeeded, their errors).
+    """
+    results = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as executor:
+        futures = [executor.submit(scrape_provider, p, client, guard, cache, history, channels)
+                   for p, channels in jobs]
+        for (provider, _), future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"{provider.name}: scraping error: {e}")
+                errors.append(e)
+    return results, errors
+
+
+def scrape_provider(provider, client, guard, cache, history, channels=None):
+    """List (unless channels are given) and resolve one provider's channels
+
+    Cached streams are reused when they stay valid for REFRESH_HORIZON.
+    Channels the run had no time (or was cancelled before) resolving keep
+    a cached stream that is still valid now. Returns (channels, resolved
+    channels, number resolved this run, number skipped, Hedger or None);
+    skipped channels were never attempted and had no cached stream to keep.
+    """
+    run = current_run()
+    if channels is None:
+        with run.phase("index"):
+            channels = provider.list_channels(client, guard)
+    if not channels:
+        print(f"{provider.name}: no channels found")
+        return [], [], 0, 0, None
+    
+    resolved_channels = []
+    pending = []
+    valid_until = time.time() + REFRESH_HORIZON
+    for ch in channels:
+        ch["key"] = provider.key(ch["id"])
+        ch["provider"] = provider.name
+        cached_url = cache.get(ch["key"], now=valid_until)
+        if cached_url:
+            ch["url"] = cached_url
+            resolved_channels.append(ch)
+        else:
+            pending.append(ch)
+    print(f"{provider.name}: stream cache {len(resolved_channels)} fresh, {len(pending)} to resolve")
+    run.progress.add_total(len(pending))
+    
+    # Start the historically slow channels first so they do not form the tail
+    pending = history.order(pending)
+    initial_delay = percentile(history.values(provider.key("")), HEDGE_PERCENTILE)
+    hedger = Hedger(initial_delay) if config.hedge else None
+    attempted = set()
+    
+    def on_result(channel, stream_url, seconds):
+        # Time to a result for the whole channel, retries and hedges included
+        attempted.add(channel["key"])
+        run.timing("channel", seconds)
+        run.progress.result(bool(stream_url))
+        history.observe(channel["key"], seconds)
+        if stream_url:
+            channel["url"] = stream_url
+            resolved_channels.append(channel)
+            cache.put(channel["key"], stream_url)
+        else:
+            cache.discard(channel["key"])
+    
+    # Resolve missing or expired stream URLs concurrently
+    engine = RESOLVER_ENGINES.get(config.engine, resolve_with_threads)
+    with run.phase("resolve"):
+        engine(provider, pending, on_result, guard, hedger)
+    skipped = [ch for ch in pending if ch["key"] not in attempted]
+    kept = 0
+    if skipped:
+        for ch in skipped:
+            cached_url = cache.get(ch["key"])
+            if cached_url:
+                ch["url"] = cached_url
+                resolved_channels.append(ch)
+                kept += 1
+        print(f"{provider.name}: {len(skipped)} channels not attempted, {kept} kept from the stream cache")
+    if hedger:
+        print(f"{provider.name}: hedged requests {hedger.stats()}")
+    return channels, resolved_channels, len(pending), len(skipped) - kept, hedger
+
+
+def resolve_stream_url(provider, stream_id, controller=None, guard=None, hedge=None):
+    """Resolve stream URL from player page, retrying transient failures
+
+    hedge(fn) runs one attempt, possibly racing a second copy of it.
+    """
+    run = current_run()
+    url = provider.player_url(stream_id)
+    guard = guard or Guard(RetryPolicy(config.retries))
+    hedge = hedge or (lambda fn: fn())
+    try:
+        stream_url = guard.call(url, lambda timeout: hedge(lambda: fetch_stream_url(provider, url, timeout, controller)),
+                                is_overload_error, config.timeout)
+        if not stream_url:
+            run.error("resolve", "no_stream")
+        return stream_url
+    except Cancelled:
+        raise
+    except Exception as e:
+        run.error("resolve", error_kind(e))
+        print(f"Error resolving {provider.name} stream {stream_id}: {e}")
+        return None
+
+
+def fetch_stream_url(provider, url, timeout, controller=None):
+    """One attempt at a player page; raises on network and HTTP errors"""
+    start = time.monotonic()
+    try:
+        client = shared_client(config.workers)
+        with client.get(url, headers=provider.headers, timeout=timeout, stream=config.stream_resolve) as response:
+            response.raise_for_status()
+            if controller:
+                controller.on_success(time.monotonic() - start)
+            if config.stream_resolve:
+                # Stop downloading once the stream URL has been seen
+                stream_url = find_stream_url_streaming(response, config.stream_max_kb * 1024)
+            else:
+                stream_url = provider.extract_stream(response.text, response.url)
+            current_run().request("resolve", time.monotonic() - start, received=response.raw.tell())
+        return stream_url
+    except Exception as e:
+        if controller and is_overload_error(e):
+            controller.on_overload()
+        raise
+
+
+def resolve_with_threads(provider, channels, on_result, guard=None, hedger=None):
+    """Resolve a provider's channels on a thread pool of its concurrency limit
+
+    With a Hedger, each attempt runs on a second pool so a slow one can be
+    raced by a backup copy; the worker thread waits for the first answer.
+    Channels are submitted through a window of a few per worker, so the
+    futures do not grow with the channel list. Channels not started when
+    the guard stops are skipped; on cancel nothing more is submitted and
+    requests in flight are abandoned.
+    """
+    guard = guard or Guard(RetryPolicy(config.retries))
+    workers = provider.concurrency or config.workers
+    controller_key = f"{provider.name}/threads"
+    controller = load_controller(CONCURRENCY_FILE, controller_key, workers) if config.adaptive else None
+    
+    def resolve(channel):
+        stream_id = channel["id"]
+        guard.check()
+        start = time.monotonic()
+        if not controller:
+            stream_url = resolve_stream_url(provider, stream_id, guard=guard, hedge=hedge)
+        else:
+            with limiter:
+                stream_url = resolve_stream_url(provider, stream_id, controller, guard, hedge)
+        return stream_url, time.monotonic() - start
+    
+    limiter = AdaptiveLimiter(controller) if controller else None
+    # Room for every worker's attempt plus a backup of each
+    hedge_pool = ThreadPoolExecutor(max_workers=workers * 2) if hedger else None
+    hedge = partial(hedger.call, executor=hedge_pool) if hedger else None
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for channel, future in completed_in_window(executor, resolve, channels, workers * WINDOW_PER_WORKER,
+                                                   guard.cancel):
+            try:
+                stream_url, seconds = future.result()
+            except (Cancelled, DeadlineExceeded):
+                # Not started: no result, so the channel counts as skipped
+                continue
+            except Exception as e:
+                print(f"Error resolving {channel['name']}: {e}")
+                stream_url, seconds = None, config.timeout
+            on_result(channel, stream_url, seconds)
+    finally:
+        # On cancel, do not wait for requests in flight; they end within their timeout
+        executor.shutdown(wait=not guard.cancel.cancelled(), cancel_futures=True)
+        if hedge_pool:
+            # Losing attempts may still be running; their results are not needed
+            hedge_pool.shutdown(wait=False, cancel_futures=True)
+    if controller:
+        save_controller(CONCURRENCY_FILE, controller_key, controller)
+        print(f"{provider.name}: adaptive concurrency {controller.stats()}")
+
+
+def resolve_with_asyncio(provider, channels, on_result, guard=None, hedger=None):
+    """Resolve a provider's channels on its own asyncio event loop"""
+    concurrency = provider.concurrency or config.async_concurrency
+    controller_key = f"{provider.name}/asyncio"
+    controller = load_controller(CONCURRENCY_FILE, controller_key, concurrency) if config.adaptive else None
+    async_engine.resolve_all(
+        channels, on_result,
+        player_url=provider.player_url,
+        headers=provider.headers,
+        match=provider.extract_stream,
+        concurrency=concurrency,
+        timeout=config.timeout,
+        controller=controller,
+        metrics=current_run(),
+        guard=guard,
+        hedger=hedger,
+        stream_max_bytes=config.stream_max_kb * 1024 if config.stream_resolve else None
+    )
+    if controller:
+        save_controller(CONCURRENCY_FILE, controller_key, controller)
+        print(f"{provider.name}: adaptive concurrency {controller.stats()}")
+
+
+RESOLVER_ENGINES = {
+    "threads": resolve_with_threads,
+    "asyncio": resolve_with_asyncio
+}
+
+
+def generate_m3u_playlist(channels):
+    """Generate M3U playlist file and the optional extra outputs"""
+    try:
+        writer = PlaylistWriter(
+            M3U_FILE,
+            categories=config.write_categories,
+            json_index=config.write_json,
+            gzip_copy=config.write_gzip
+        )
+        with current_run().phase("write"):
+            written = writer.write(channels)
+        print(f"Playlist saved: {M3U_FILE} ({len(written)} files)")
+        return written
+    except Exception as e:
+        print(f"Error generating playlist: {e}")
+        raise
+
+
+def upload_to_github(cancel=None):
+    """Upload M3U file to GitHub; a set CancelToken stops before the next request"""
+    with current_run().phase("upload"):
+        return _upload_to_github(cancel or CancelToken())
+
+
+def _upload_to_github(cancel):
+    try:
+        if not config.token or not config.repo:
+            print("GitHub not configured")
+            return False
+        
+        cancel.check()
+        if config.publish_backend == "gitdata":
+            return publish_with_git_data(published_files(), cancel)
+        
+        client = shared_client(config.workers)
+        run = current_run()
+        url = f"{GITHUB_API}/repos/{config.repo}/contents/{config.path}"
+        headers = {
+            "Authorization": f"token {config.token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        
+        def github_request(method, **kwargs):
+            cancel.check()
+            start = time.monotonic()
+            try:
+                response = client.request(method, url, headers=headers, **kwargs)
+            except Exception as e:
+                run.error("github", error_kind(e))
+                raise
+            run.request("github", time.monotonic() - start,
+                        received=len(response.content), sent=len(response.request.body or b""))
+            return response
+        
+        def fetch_remote_sha():
+            """Get existing file SHA (if exists)"""
+            try:
+                response = github_request("GET", params={"ref": config.branch}, timeout=10)
+                if response.status_code == 200:
+                    return response.json().get("sha")
+            except Exception as e:
+                print(f"GitHub SHA lookup error: {e}")
+            return None
+        
+        # Compare the playlist's git blob SHA with the last known remote SHA
+        content = M3U_FILE.read_bytes()
+        local_sha = git_blob_sha(content)
+        sha_cache = JsonCache(CACHE_DIR / "github.json")
+        cache_key = f"{config.repo}@{config.branch}:{config.path}"
+        sha = sha_cache.data.get(cache_key)
+        if sha == local_sha:
+            print("Playlist unchanged since last upload, skipping GitHub")
+            return True
+        if sha is None:
+            sha = fetch_remote_sha()
+            if sha == local_sha:
+                sha_cache.data[cache_key] = sha
+                sha_cache.save()
+                print("Playlist already up to date on GitHub")
+                return True
+        
+        def put_contents(sha):
+            data = {
+                "message": f"Update playlist {time.strftime('%Y-%m-%d %H:%M:%S')}",
+                "content": base64.b64encode(content).decode('utf-8'),
+                "branch": config.branch
+            }
+            if sha:
+                data["sha"] = sha
+            return github_request("PUT", json=data, timeout=15)
+        
+        # Upload with the cached SHA; if GitHub rejects it, look it up once
+        response = put_contents(sha)
+        if response.status_code in (409, 422):
+            sha = fetch_remote_sha()
+            response = None if sha == local_sha else put_contents(sha)
+        
+        if response is None or response.status_code in [200, 201]:
+            remote_sha = response.json().get("content", {}).get("sha") if response is not None else local_sha
+            sha_cache.data[cache_key] = remote_sha or local_sha
+            sha_cache.save()
+            print("Successfully uploaded to GitHub")
+            return True
+        else:
+            sha_cache.data.pop(cache_key, None)
+            sha_cache.save()
+            run.error("github", f"HTTP {response.status_code}")
+            print(f"GitHub upload failed: {response.status_code} - {response.text}")
+            return False
+    
+    except Cancelled:
+        print("GitHub upload cancelled")
+        raise
+    except Exception as e:
+        print(f"GitHub upload error: {e}")
+        return False
+
+
+def published_files():
+    """Files to publish, keyed by their path in the repository"""
+    outputs = existing_outputs(
+        M3U_FILE,
+        categories=config.write_categories,
+        json_index=config.write_json,
+        gzip_copy=config.write_gzip
+    )
+    repo_base = PurePosixPath(config.path)
+    files = {str(target_path(repo_base, key)): path.read_bytes() for key, path in outputs.items()}
+    if config.mirror_logos:
+        # Unchanged logos have the same blob SHA and are not uploaded again
+        folder = repo_base.parent / LOGO_FOLDER
+        for name, path in LogoCache(LOGO_FILE, LOGO_DIR).files().items():
+            files[str(folder / name)] = path.read_bytes()
+    return files
+
+
+def load_playlist_server(server):
+    """Hand the files of the last refresh to a playlist_server.PlaylistServer"""
+    server.load(published_files(), main=config.path)
+
+
+def publish_with_git_data(files, cancel=None):
+    """Publish all files as a single commit through the Git Data API"""
+    publisher = GitDataPublisher(
+        shared_client(config.workers),
+        config.repo,
+        config.branch,
+        config.token,
+        api_url=GITHUB_API,
+        state_path=CACHE_DIR / "publish.json",
+        metrics=current_run(),
+        cancel=cancel
+    )
+    try:
+        publisher.publish(files)
+        return True
+    except PublishError as e:
+        print(f"GitHub publish failed: {e}")
+        return False
@@ -0,0 +1,259 @@
+"""Single-pass m3u8 matcher for player pages
+
+Every stream pattern must contain the anchor ".m3u8". Instead of running
+each pattern over the whole page, the matcher scans the page once for the
+anchor and only evaluates the precompiled patterns in a window around each
+occurrence, in priority order. A page without the anchor costs one lower()
+and one str.find, and scanning stops at the first top-priority candidate.
+When a match runs into the edge of its window, the window is widened and
+the patterns are tried again, so a long signed URL is never returned cut
+short. When nothing matches inside a window that cuts into the page (an
+anchor of a URL longer than the window, or one that belongs to no URL,
+e.g. base + id + ".m3u8" in a script), the page is searched like the
+legacy loop instead: one re.search per pattern, in priority order.
+
+The candidate from the highest-priority pattern wins; ties go to the
+earliest in the page, which keeps the semantics of trying each pattern with
+re.search in turn.
+"""
+import codecs
+import re
+import threading
+from urllib.parse import urljoin
+
+# Lower number = preferred; gaps leave room for site-specific patterns
+PRIORITY_IFRAME = 10
+PRIORITY_SOURCE_TAG = 20
+PRIORITY_FILE_KEY = 30
+PRIORITY_SOURCE_KEY = 40
+PRIORITY_BARE_URL = 50
+
+ANCHOR = ".m3u8"
+# How far before/after an anchor a match may start/end, at first
+LOOKBEHIND = 768
+LOOKAHEAD = 768
+# Window growth when a match may extend past the window
+WIDEN_FACTOR = 4
+# candidate() result when its window cannot tell
+UNDECIDED = object()
+# Finish reading a response instead of dropping the keep-alive connection
+# when no more than this many bytes are left after an early match
+DRAIN_LIMIT = 16 * 1024
+# Bytes read per step in streaming mode
+CHUNK_SIZE = 8192
+
+
+class StreamMatcher:
+    """Registry of precompiled m3u8 patterns evaluated around anchor hits"""
+    def __init__(self, anchor=ANCHOR, lookbehind=LOOKBEHIND, lookahead=LOOKAHEAD, flags=re.IGNORECASE):
+        self.anchor = anchor.lower()
+        self.lookbehind = lookbehind
+        self.lookahead = lookahead
+        self.flags = flags
+        self.lock = threading.Lock()
+        self.patterns = []  # (priority, order, name, compiled regex)
+
+    def register(self, name, pattern, priority):
+        """Add a pattern whose first group captures the URL
+
+        Matches must contain the anchor text (".m3u8" by default).
+        """
+        regex = re.compile(pattern, self.flags)
+        if regex.groups < 1:
+            raise ValueError(f"Pattern '{name}' must capture the stream URL in a group")
+        with self.lock:
+            patterns = self.patterns + [(priority, len(self.patterns), name, regex)]
+            # Readers use whatever list they grabbed; swap in a new sorted one
+            self.patterns = sorted(patterns, key=lambda p: (p[0], p[1]))
+
+    def best(self, text):
+        """Return (priority, raw_url, match) of the best candidate, or None"""
+        patterns = self.patterns
+        if not patterns:
+            return None
+        top_priority = patterns[0][0]
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Some non-ASCII characters change length when lowercased
+            lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+        anchor = self.anchor
+
+        best = None
+        pos = lowered.find(anchor)
+        while pos != -1:
+            found = self.candidate(patterns, text, pos, best[0] if best else None)
+            if found is UNDECIDED:
+                return self.search(patterns, text)
+            if found:
+                best = found
+            if best is not None and best[0] <= top_priority:
+                break
+            pos = lowered.find(anchor, pos + len(anchor))
+        return best
+
+    def candidate(self, patterns, text, pos, below=None):
+        """(priority, raw_url, match) of the best match covering the anchor at pos
+
+        Only patterns with a priority below `below` are tried. The window
+        grows while it cuts into the text and the match touches its edge,
+        since that may shorten the URL. UNDECIDED when nothing matched in
+        a window that cuts into the text.
+        """
+        size = len(text)
+        behind, ahead = self.lookbehind, self.lookahead
+        while True:
+            lo = max(0, pos - behind)
+            hi = min(size, pos + len(self.anchor) + ahead)
+            found = None
+            for priority, _, _, regex in patterns:
+                if below is not None and priority >= below:
+                    break
+                match = self.match_at(regex, text, lo, hi, pos)
+                if match:
+                    found = (priority, match.group(1), match)
+                    break
+            if lo == 0 and hi == size:
+                return found
+            if found is None:
+                return UNDECIDED
+            if (lo == 0 or found[2].start() > lo) and (hi == size or found[2].end() < hi):
+                return found
+            behind *= WIDEN_FACTOR
+            ahead *= WIDEN_FACTOR
+
+    @staticmethod
+    def search(patterns, text):
+        """Best candidate the legacy way: the first pattern that matches anywhere"""
+        for priority, _, _, regex in patterns:
+            match = regex.search(text)
+            if match:
+                return priority, match.group(1), match
+        return None
+
+    @staticmethod
+    def match_at(regex, text, lo, hi, pos):
+        """First match in text[lo:hi] that covers the anchor at pos"""
+        for match in regex.finditer(text, lo, hi):
+            if match.start() > pos:
+                return None
+            if match.end() > pos:
+                return match
+        return None
+
+    def find(self, text, page_url):
+        """Resolve the best m3u8 URL in a page against the page URL"""
+        best = self.best(text)
+        return self.to_url(best[1] if best else None, page_url)
+
+    @staticmethod
+    def to_url(raw_url, page_url):
+        if raw_url:
+            return urljoin(page_url, raw_url.strip())
+
+        # Check if redirected to m3u8
+        if ".m3u8" in page_url:
+            return page_url
+        return None
+
+    def complete(self, best, text):
+        """best, unless it runs into the end of a cut-off text; then the best before it"""
+        if best and best[2].end() >= len(text):
+            return self.best(text[:best[2].start()])
+        return best
+
+    def find_prefix(self, text, page_url):
+        """find() for the start of a page whose reading stopped at a size limit
+
+        A URL running into the cut may be incomplete and is not used, as
+        in find_streaming().
+        """
+        best = self.complete(self.best(text), text)
+        return self.to_url(best[1] if best else None, page_url)
+
+    def find_streaming(self, response, max_bytes, chunk_size=CHUNK_SIZE):
+        """Scan a streamed requests response chunk by chunk
+
+        Returns early only once the buffered text holds a complete
+        candidate of the top priority, which nothing later in the page can
+        beat. Otherwise reading goes on to the end of the page or max_bytes,
+        and the best candidate in what was read wins, exactly as in
+        full-page mode; a URL still running at max_bytes is not used. Text
+        is only dropped while it holds no candidate, and only whole lines
+        well behind the end of the buffer. The caller closes the response;
+        a short unread remainder is drained first so the connection can go
+        back to the pool.
+        """
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        patterns = self.patterns
+        top_priority = patterns[0][0] if patterns else None
+        keep = self.lookbehind + len(self.anchor) + self.lookahead
+        chunks = response.iter_content(chunk_size)
+        buffer = ""
+        received = 0
+        best = None
+
+        for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            best = self.best(buffer)
+            if received >= max_bytes:
+                # Out of budget. This one chunk past the cap shows whether a
+                # candidate running into it ends; one that still does not may
+                # be cut short, so only the text before it counts
+                best = self.complete(best, buffer)
+                break
+            received += len(chunk)
+            # A match touching the end of the buffer may still grow
+            if best and best[0] <= top_priority and best[2].end() < len(buffer):
+                break
+            if best is None and len(buffer) > keep:
+                # Cut at a line break, so a long URL still being read stays whole
+                cut = buffer.rfind("\n", 0, len(buffer) - keep)
+                if cut > 0:
+                    buffer = buffer[cut:]
+        else:
+            best = self.best(buffer + decoder.decode(b"", final=True))
+
+        raw_url = best[1] if best else None
+        if raw_url:
+            drain(response, chunks)
+        return self.to_url(raw_url, response.url)
+
+
+DEFAULT_MATCHER = StreamMatcher()
+DEFAULT_MATCHER.register("iframe", r'<iframe[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']', PRIORITY_IFRAME)
+DEFAULT_MATCHER.register("source_tag", r'<source[^>]+src=["\']([^"\']*\.m3u8[^"\']*)["\']', PRIORITY_SOURCE_TAG)
+DEFAULT_MATCHER.register("file_key", r'file:\s*["\']([^"\']*\.m3u8[^"\']*)["\']', PRIORITY_FILE_KEY)
+DEFAULT_MATCHER.register("source_key", r'source:\s*["\']([^"\']*\.m3u8[^"\']*)["\']', PRIORITY_SOURCE_KEY)
+DEFAULT_MATCHER.register("bare_url", r'(https?://[^\s\'"<>]*\.m3u8[^\s\'"<>]*)', PRIORITY_BARE_URL)
+
+
+def register_pattern(name, pattern, priority):
+    """Register a site pattern with the matcher used by the resolver"""
+    DEFAULT_MATCHER.register(name, pattern, priority)
+
+
+def find_stream_url(text, page_url):
+    return DEFAULT_MATCHER.find(text, page_url)
+
+
+def find_stream_url_prefix(text, page_url):
+    return DEFAULT_MATCHER.find_prefix(text, page_url)
+
+
+def find_stream_url_streaming(response, max_bytes):
+    return DEFAULT_MATCHER.find_streaming(response, max_bytes)
+
+
+def drain(response, chunks):
+    """Read a short remaining body so requests releases the connection"""
+    try:
+        length = int(response.headers.get("Content-Length", ""))
+        remaining = length - response.raw.tell()
+    except (ValueError, AttributeError):
+        return
+    if 0 <= remaining <= DRAIN_LIMIT:
+        for _ in chunks:
+            pass
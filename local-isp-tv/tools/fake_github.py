@@ -0,0 +1,310 @@
+"""Local stand-in for the parts of the GitHub REST API the app uses
+
+Serves, from memory:
+- GET /user (token check)
+- GET/PUT /repos/{owner}/{repo}/contents/{path} (Contents API uploader)
+- the Git Data API used by GitDataPublisher: refs, commits, trees, blobs
+
+Run it as a server for manual testing:
+
+    python tools/fake_github.py --port 8765
+
+or run an offline check of both publishing backends (the Contents API
+upload in scraper.py and GitDataPublisher):
+
+    python tools/fake_github.py --check
+"""
+import argparse
+import base64
+import hashlib
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cache import git_blob_sha
+
+
+def object_sha(kind, payload):
+    return hashlib.sha1(kind.encode() + json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class FakeRepo:
+    """One repository: objects plus branch refs, with a flat path -> blob tree"""
+    def __init__(self, branch="main"):
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        readme = b"# playlists\n"
+        blob = self.add_blob(readme)
+        tree = self.add_tree({"README.md": blob})
+        self.refs[branch] = self.add_commit("Initial commit", tree, [])
+
+    def add_blob(self, content):
+        sha = git_blob_sha(content)
+        self.blobs[sha] = content
+        return sha
+
+    def add_tree(self, entries):
+        sha = object_sha("tree", entries)
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def add_commit(self, message, tree, parents):
+        sha = object_sha("commit", {"message": message, "tree": tree, "parents": parents})
+        self.commits[sha] = {"message": message, "tree": tree, "parents": parents}
+        return sha
+
+    def file(self, branch, path):
+        head = self.refs.get(branch)
+        if head is None:
+            return None
+        return self.trees[self.commits[head]["tree"]].get(path)
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, Handler)
+        self.repos = {}
+        self.requests = Counter()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def repo(self, name):
+        if name not in self.repos:
+            self.repos[name] = FakeRepo()
+        return self.repos[name]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload=None, headers=None):
+        body = json.dumps(payload if payload is not None else {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def route(self, method):
+        parts = urlsplit(self.path)
+        self.server.requests[f"{method} {re.sub(r'[0-9a-f]{40}', '<sha>', parts.path)}"] += 1
+        if parts.path == "/user":
+            return self.reply(200, {"login": "offline"}, {"X-OAuth-Scopes": "repo"})
+
+        match = re.match(r"^/repos/([^/]+/[^/]+)/(contents|git)/(.+)$", parts.path)
+        if not match:
+            return self.reply(404, {"message": "Not Found"})
+        repo = self.server.repo(match.group(1))
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        with repo.lock:
+            if match.group(2) == "contents":
+                return self.contents(method, repo, match.group(3), query)
+            return self.git(method, repo, match.group(3))
+
+    def contents(self, method, repo, path, query):
+        if method == "GET":
+            sha = repo.file(query.get("ref", "main"), path)
+            if sha is None:
+                return self.reply(404, {"message": "Not Found"})
+            return self.reply(200, {"path": path, "sha": sha})
+
+        data = self.body()
+        branch = data.get("branch", "main")
+        current = repo.file(branch, path)
+        if current and data.get("sha") is None:
+            return self.reply(422, {"message": "\"sha\" wasn't supplied."})
+        if current and data["sha"] != current:
+            return self.reply(409, {"message": f"{path} does not match {data['sha']}"})
+        blob = repo.add_blob(base64.b64decode(data["content"]))
+        head = repo.refs[branch]
+        entries = dict(repo.trees[repo.commits[head]["tree"]], **{path: blob})
+        repo.refs[branch] = repo.add_commit(data["message"], repo.add_tree(entries), [head])
+        return self.reply(201 if current is None else 200, {"content": {"path": path, "sha": blob}})
+
+    def git(self, method, repo, path):
+        if method == "GET" and path.startswith("ref/heads/"):
+            head = repo.refs.get(path[len("ref/heads/"):])
+            if head is None:
+                return self.reply(404, {"message": "Not Found"})
+            return self.reply(200, {"object": {"sha": head, "type": "commit"}})
+        if method == "GET" and path.startswith("commits/"):
+            commit = repo.commits.get(path[len("commits/"):])
+            if commit is None:
+                return self.reply(404, {"message": "Not Found"})
+            return self.reply(200, {"tree": {"sha": commit["tree"]}, "parents": [{"sha": p} for p in commit["parents"]]})
+        if method == "GET" and path.startswith("trees/"):
+            tree = repo.trees.get(path[len("trees/"):])
+            if tree is None:
+                return self.reply(404, {"message": "Not Found"})
+            entries = [{"path": p, "type": "blob", "mode": "100644", "sha": s} for p, s in sorted(tree.items())]
+            return self.reply(200, {"tree": entries, "truncated": False})
+
+        data = self.body()
+        if method == "POST" and path == "blobs":
+            content = base64.b64decode(data["content"]) if data.get("encoding") == "base64" else data["content"].encode()
+            return self.reply(201, {"sha": repo.add_blob(content)})
+        if method == "POST" and path == "trees":
+            entries = dict(repo.trees.get(data.get("base_tree"), {}))
+            for entry in data["tree"]:
+                if entry["sha"] is None:
+                    entries.pop(entry["path"], None)
+                    continue
+                if entry["sha"] not in repo.blobs:
+                    return self.reply(422, {"message": f"Invalid blob {entry['sha']}"})
+                entries[entry["path"]] = entry["sha"]
+            return self.reply(201, {"sha": repo.add_tree(entries)})
+        if method == "POST" and path == "commits":
+            return self.reply(201, {"sha": repo.add_commit(data["message"], data["tree"], data["parents"])})
+        if method == "PATCH" and path.startswith("refs/heads/"):
+            branch = path[len("refs/heads/"):]
+            commit = repo.commits.get(data["sha"])
+            if commit is None or (not data.get("force") and repo.refs.get(branch) not in commit["parents"]):
+                return self.reply(422, {"message": "Update is not a fast forward"})
+            repo.refs[branch] = data["sha"]
+            return self.reply(200, {"object": {"sha": data["sha"]}})
+        return self.reply(404, {"message": "Not Found"})
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_PUT(self):
+        self.route("PUT")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_PATCH(self):
+        self.route("PATCH")
+
+
+def check():
+    """Publish through both backends against the stand-in and report requests"""
+    server = FakeGitHub().start()
+    try:
+        failures = check_contents(server) + check_git_data(server)
+    finally:
+        server.shutdown()
+    return 1 if failures else 0
+
+
+def report(label, ok, detail):
+    print(f"{'ok ' if ok else 'BAD'} {label}: {detail}")
+    return 0 if ok else 1
+
+
+def check_contents(server):
+    """Contents API upload: one PUT, then skipped by the remembered blob SHA"""
+    import tempfile
+    import scraper
+    from app_config import config
+
+    workdir = Path(tempfile.mkdtemp())
+    scraper.GITHUB_API = server.url
+    scraper.CACHE_DIR = workdir / "cache"
+    scraper.M3U_FILE = workdir / "channels.m3u"
+    config.token, config.repo, config.branch, config.path = "token", "me/contents", "main", "channels.m3u"
+    config.publish_backend = "contents"
+
+    failures = 0
+    for label, content, forget, expected in [
+        ("contents: first upload", b"#EXTM3U\n", False, {"GET": 1, "PUT": 1}),
+        ("contents: unchanged", b"#EXTM3U\n", False, {}),
+        ("contents: unchanged, SHA cache lost", b"#EXTM3U\n", True, {"GET": 1}),
+        ("contents: changed", b"#EXTM3U\n#EXTINF:-1,News\n", False, {"PUT": 1})
+    ]:
+        scraper.M3U_FILE.write_bytes(content)
+        if forget:
+            (scraper.CACHE_DIR / "github.json").unlink()
+        server.requests.clear()
+        ok = scraper.upload_to_github()
+        methods = Counter()
+        for request, count in server.requests.items():
+            methods[request.split()[0]] += count
+        failures += report(label, ok and methods == Counter(expected), f"requests={dict(methods)}")
+
+    repo = server.repos["me/contents"]
+    blob = repo.file("main", "channels.m3u")
+    failures += report("contents: final file", repo.blobs.get(blob) == content, f"{len(repo.commits)} commits")
+    return failures
+
+
+def check_git_data(server):
+    """Git Data API publish: changed files only, stale files deleted"""
+    import tempfile
+    from github_publisher import GitDataPublisher
+    from http_client import HttpClient
+
+    client = HttpClient(4)
+    state = Path(tempfile.mkdtemp()) / "publish.json"
+    publisher = GitDataPublisher(client, "me/playlists", "main", "token", api_url=server.url, state_path=state)
+    files = {
+        "channels.m3u": b"#EXTM3U\n",
+        "channels.json": b"[]",
+        "categories/news.m3u": b"#EXTM3U\n"
+    }
+    updated = dict(files, **{"channels.json": b"[1]"})
+
+    failures = 0
+    for label, payload, expected in [
+        ("git data: first publish", files, 3),
+        ("git data: unchanged", files, 0),
+        ("git data: one file changed", updated, 1),
+        ("git data: category playlist dropped", {p: c for p, c in updated.items() if "/" not in p}, 1)
+    ]:
+        server.requests.clear()
+        changed = publisher.publish(payload)
+        failures += report(label, len(changed) == expected,
+                           f"changed={changed} requests={sum(server.requests.values())}")
+
+    repo = server.repos["me/playlists"]
+    head = repo.commits[repo.refs["main"]]
+    tree = repo.trees[head["tree"]]
+    ok = repo.blobs[tree["channels.json"]] == b"[1]" and "README.md" in tree and "categories/news.m3u" not in tree
+    failures += report("git data: final tree", ok, sorted(tree))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--check", action="store_true", help="run an offline publish check and exit")
+    args = parser.parse_args()
+    if args.check:
+        return check()
+    server = FakeGitHub(("127.0.0.1", args.port))
+    print(f"Fake GitHub API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Local stand-in for redforce.live
+
+Serves a generated channel index (ul#vidlink) and player.php pages that
+carry the stream URL in each of the shapes the stream matcher recognizes:
+iframe, <source>, jwplayer file:, Clappr source:, a bare URL in a script,
+plus pages with no stream at all. Every page shape, URL form (absolute,
+root-relative, protocol-relative, signed with an expiry) and category is
+derived from the stream ID, so runs are reproducible.
+
+    /                        index with --channels channels
+    /<N>/                    index with N channels; players under /<N>/
+    /<N>/player.php?stream=  player page
+    /<N>/logos/<ID>.png      channel logo with ETag / Last-Modified; answers
+                             conditional requests with 304
+    /_stats                  {"requests", "bytes", "errors"} since start/reset
+    /_stats?reset=1          read and reset the counters
+
+Player requests take --latency seconds +/- --jitter and fail with a 503 at
+--error-rate. A --tail-rate share of requests are stragglers that take
+--tail-latency seconds instead, as do all requests for a --slow-share of
+stream IDs. Run it as a server:
+
+    python tools/fake_redforce.py --channels 500 --latency 0.05 --jitter 0.02
+"""
+import argparse
+import json
+import struct
+import zlib
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CATEGORIES = ["News", "Sports", "Entertainment", "Movies", "Kids", "Music", "Religious", "International"]
+
+SHAPES = {
+    "iframe": '<iframe id="frame" width="100%" height="480" allowfullscreen src="{url}"></iframe>',
+    "video_source": '<video id="player" controls>\n  <source src="{url}" type="application/x-mpegURL">\n</video>',
+    "jwplayer_file": '<script>\n  jwplayer("player").setup({{\n    file: "{url}",\n    autostart: true\n  }});\n</script>',
+    "clappr_source": "<script>\n  var player = new Clappr.Player({{\n    source: '{url}',\n    parentId: '#player'\n  }});\n</script>",
+    "bare_url": '<script>\n  var streams = ["{url}"];\n  play(streams[0]);\n</script>',
+    "offline": '<div class="offline">This channel is currently offline.</div>'
+}
+# Share of channels per shape, in SHAPES order
+SHAPE_WEIGHTS = [30, 25, 20, 10, 12, 3]
+
+
+def shape_for(stream_id):
+    """Deterministic page shape for a stream ID"""
+    point = (stream_id * 7919) % sum(SHAPE_WEIGHTS)
+    for name, weight in zip(SHAPES, SHAPE_WEIGHTS):
+        if point < weight:
+            return name
+        point -= weight
+    return "iframe"
+
+
+def stream_url(stream_id, absolute=False):
+    """Absolute, root-relative, protocol-relative or signed, by stream ID"""
+    form = stream_id % 4
+    if form == 0 or (absolute and form in (1, 2)):
+        return f"http://tv.redforce.live:8082/live/ch{stream_id}/index.m3u8"
+    if form == 1:
+        return f"/hls/ch{stream_id}/index.m3u8"
+    if form == 2:
+        return f"//cdn2.redforce.live/hls/ch{stream_id}/playlist.m3u8"
+    # Signed URLs expire two hours after they were issued
+    return f"http://172.16.30.4:8080/ch{stream_id}/index.m3u8?token={stream_id:x}&e={int(time.time()) + 7200}"
+
+
+def filler(size):
+    """CSS rules resembling the real pages' inline styles"""
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = f".ch-{i} {{ margin: {i % 9}px; padding: {i % 5}px; color: #{(i * 2654435761) % 0xffffff:06x}; }}\n"
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return "".join(lines)
+
+
+def player_page(stream_id, page_size):
+    shape = shape_for(stream_id)
+    # A bare URL in a script is only recognizable when absolute
+    snippet = SHAPES[shape].format(url=stream_url(stream_id, absolute=shape == "bare_url"))
+    # The stream URL sits about two thirds into the page, as on the live site
+    head = filler(page_size * 2 // 3)
+    tail = filler(max(0, page_size - len(head) - len(snippet) - 300))
+    return (
+        f'<!DOCTYPE html>\n<html lang="en">\n<head>\n  <meta charset="utf-8">\n'
+        f'  <title>Channel {stream_id} - RedForce Live</title>\n'
+        f'  <style>\n{head}  </style>\n</head>\n<body>\n{snippet}\n'
+        f'<style>\n{tail}</style>\n</body>\n</html>\n'
+    )
+
+
+# Logos never change; every one claims to date from this time
+LOGO_MODIFIED = formatdate(1700000000, usegmt=True)
+
+
+def logo_png(stream_id, size=64):
+    """A solid size x size RGB PNG whose colour derives from the stream ID"""
+    rng = random.Random(stream_id)
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    rows = b"".join(b"\x00" + pixel * size for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def index_page(channels):
+    items = []
+    for i in range(1, channels + 1):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        items.append(
+            f'<li class="All {category}"><a href="#" onclick="play(\'player.php?stream={i}\')">'
+            f'<img src="logos/{i}.png" alt="Channel {i}"></a></li>'
+        )
+    return (
+        '<!DOCTYPE html>\n<html>\n<head><title>RedForce Live</title></head>\n<body>\n'
+        '<ul id="vidlink">\n' + "\n".join(items) + '\n</ul>\n</body>\n</html>\n'
+    )
+
+
+class FakeRedforce(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address=("127.0.0.1", 0), channels=100, latency=0.0, jitter=0.0,
+                 error_rate=0.0, page_size=20 * 1024, seed=1, tail_rate=0.0, tail_latency=1.0, slow_share=0.0):
+        super().__init__(address, Handler)
+        self.channels = channels
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.slow_share = slow_share
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0}
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def index(self, channels):
+        if channels not in self.indexes:
+            self.indexes[channels] = index_page(channels).encode("utf-8")
+        return self.indexes[channels]
+
+    def delay(self, stream_id):
+        with self.lock:
+            straggler = self.random.random() < self.tail_rate
+            latency = self.tail_latency if straggler or self.is_slow(stream_id) else self.latency
+            return max(0.0, latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def is_slow(self, stream_id):
+        """Channels that are always slow, picked by stream ID"""
+        return (stream_id * 2654435761) % 1000 < self.slow_share * 1000
+
+    def fails(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def count(self, size, error=False):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += size
+            self.stats["errors"] += error
+
+    def read_stats(self, reset=False):
+        with self.lock:
+            stats = dict(self.stats)
+            if reset:
+                self.stats = {"requests": 0, "bytes": 0, "errors": 0}
+        return stats
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body, content_type="text/html; charset=utf-8", counted=True):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if counted:
+            self.server.count(len(body), error=status >= 400)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path == "/_stats":
+            stats = self.server.read_stats(reset="reset" in query)
+            return self.reply(200, json.dumps(stats).encode(), "application/json", counted=False)
+
+        logo = re.match(r"^/(?:\d+/)?logos/(\d+)\.png$", parts.path)
+        if logo:
+            return self.reply_logo(int(logo.group(1)))
+
+        match = re.match(r"^/(?:(\d+)/)?(player\.php)?$", parts.path)
+        if not match:
+            return self.reply(404, b"Not Found")
+        channels = int(match.group(1)) if match.group(1) else self.server.channels
+        if not match.group(2):
+            return self.reply(200, self.server.index(channels))
+
+        stream = query.get("stream", [""])[0]
+        if not stream.isdigit() or not 0 < int(stream) <= channels:
+            return self.reply(404, b"Unknown stream")
+        time.sleep(self.server.delay(int(stream)))
+        if self.server.fails():
+            return self.reply(503, b"Service Unavailable")
+        self.reply(200, player_page(int(stream), self.server.page_size).encode("utf-8"))
+
+
+    def reply_logo(self, stream_id):
+        etag = f'"logo-{stream_id}"'
+        if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == LOGO_MODIFIED:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.server.count(0)
+            return
+        body = logo_png(stream_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LOGO_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(len(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--channels", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per player page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of player requests answered 503")
+    parser.add_argument("--page-kb", type=float, default=20, help="player page size in KB")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of player requests that straggle")
+    parser.add_argument("--tail-latency", type=float, default=1.0, help="seconds a straggler or slow channel takes")
+    parser.add_argument("--slow-share", type=float, default=0.0, help="share of channels that are always slow")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    server = FakeRedforce(("127.0.0.1", args.port), args.channels, args.latency, args.jitter,
+                          args.error_rate, int(args.page_kb * 1024), args.seed, args.tail_rate,
+                          args.tail_latency, args.slow_share)
+    print(f"Fake redforce.live on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())